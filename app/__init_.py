@@ -12,12 +12,13 @@ __description__ = "User management microservice with FastAPI and PostgreSQL"
 from app.main import app
 from app.config import config
 from app.database import db
-from .auth_service import AuthTokenService, auth_token_service
+from .auth_service import AuthTokenService, get_auth_token_service
 
 
 __all__ = [
     
-    "AuthTokenService"
+    "AuthTokenService",
+    "get_auth_token_service"
     
     
 ]
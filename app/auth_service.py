@@ -1,9 +1,15 @@
 import os
 import uuid
+import asyncio
+import time
+import hmac
+import hashlib
+import threading
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from psycopg2.extensions import cursor as TupleCursor
 import jwt  # Agora deve funcionar após a instalação
-from dotenv import load_dotenv
+from cachetools import TTLCache
 from app.config import config
 from app.database import db
 import logging
@@ -12,13 +18,26 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cache de tokens já validados: chave = sha256(token)[:32], valor = payload decodificado.
+# O token bruto nunca fica em memória; entradas expiram em 30s ou no 'exp' do token.
+_token_cache = TTLCache(maxsize=10000, ttl=30)
+_token_cache_lock = threading.Lock()
+
+
+def _token_cache_key(token_string: str) -> str:
+    return hashlib.sha256(token_string.encode()).hexdigest()[:32]
+
+
+def _cached_payload(client_id: str, expires_at: datetime) -> Dict[str, Any]:
+    return {"client_id": client_id, "exp": expires_at.timestamp()}
+
 class AuthTokenService:
     def __init__(self):
-        load_dotenv()
-        
+        # .env já foi carregado por app.config
         self.jwt_secret = os.getenv('JWT_SECRET')
         if not self.jwt_secret or len(self.jwt_secret) < 32:
             raise ValueError("JWT_SECRET should have 32+ characters")
+        self._jwt_secret_b = self.jwt_secret.encode('utf-8')
         
         
         self.client_credentials = self._load_client_credentials()
@@ -26,7 +45,7 @@ class AuthTokenService:
         if not self.client_credentials:
             raise ValueError("CLIENT_ID_1 and SECRET_1 must be set in environment")
 
-    def _load_client_credentials(self) -> Dict[str, str]:
+    def _load_client_credentials(self) -> Dict[str, bytes]:
         
         credentials = {}
         
@@ -34,7 +53,7 @@ class AuthTokenService:
         secret = os.getenv('SECRET_1')
         
         if client_id and secret:
-            credentials[client_id] = secret
+            credentials[client_id] = secret.encode('utf-8')
         
         return credentials
 
@@ -44,16 +63,17 @@ class AuthTokenService:
 
         
         stored_secret = self.client_credentials.get(client_id)
-        if not stored_secret:
+        if stored_secret is None:
             logger.warning(f"client_id não encontrado: {client_id}")
             raise ValueError("invalid client_id or secret")
             
-        if stored_secret != client_secret:
+        if not hmac.compare_digest(stored_secret, client_secret.encode('utf-8')):
             logger.warning(f"Segredo inválido para client_id={client_id}")
             raise ValueError("invalid client_id or secret")
 
         
-        expiration = datetime.now(timezone.utc) + timedelta(minutes=2)
+        now = datetime.now(timezone.utc)
+        expiration = now + timedelta(minutes=2)
         logger.debug(f"Expiração definida para: {expiration.isoformat()}")
 
         
@@ -64,7 +84,7 @@ class AuthTokenService:
 
         try:
             
-            token_string = jwt.encode(payload, self.jwt_secret, algorithm="HS256")
+            token_string = jwt.encode(payload, self._jwt_secret_b, algorithm="HS256")
             logger.info(f"Token JWT gerado com sucesso para client_id={client_id}")
         except Exception as e:
             logger.error(f"Falha ao assinar token JWT: {e}")
@@ -74,17 +94,13 @@ class AuthTokenService:
         try:
             with db.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute('''
-                        INSERT INTO public.auth_tokens 
-                        (id, client_id, jwt_token, expires_at, created_at, updated_at)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    ''', (
+                    db.execute_prepared(cursor, "ins_auth_token", (
                         str(uuid.uuid4()),
                         client_id,
                         token_string,
                         expiration,
-                        datetime.now(timezone.utc),
-                        datetime.now(timezone.utc)
+                        now,
+                        now
                     ))
                     conn.commit()
                     
@@ -100,68 +116,126 @@ class AuthTokenService:
             "expires_at": expiration.isoformat()
         }
 
-    def validate_token(self, token_string: str) -> bool:
-        
+    def validate_token(self, token_string: str) -> Optional[Dict[str, Any]]:
+        # Retorna o payload do token (client_id, exp), ou None se o token não for válido
+        key = _token_cache_key(token_string)
+        with _token_cache_lock:
+            cached = _token_cache.get(key)
+        if cached is not None and cached.get('exp', 0) > time.time():
+            return cached
+
         try:
             
             with db.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute('''
-                        SELECT EXISTS (
-                            SELECT 1 FROM public.auth_tokens 
-                            WHERE jwt_token = %s AND expires_at > NOW()
-                        ) AS is_valid
-                    ''', (token_string,))
+                # Cursor de tuplas: caminho quente, sem dict por linha
+                with conn.cursor(cursor_factory=TupleCursor) as cursor:
+                    db.execute_prepared(cursor, "sel_auth_token", (token_string,))
                     
-                    result = cursor.fetchone()
-                    is_valid = result['is_valid'] if result else False
+                    row = cursor.fetchone()
 
-            if not is_valid:
-                return False
+        except Exception as e:
+            logger.error(f"Erro ao validar token no banco, usando apenas a assinatura: {e}")
+            return self._validate_signature(token_string)
 
-            
-            jwt.decode(token_string, self.jwt_secret, algorithms=["HS256"])
-            return True
+        if not row:
+            return None
+
+        # Só este serviço grava em auth_tokens, e assina com este segredo: a linha no
+        # banco dispensa refazer o HMAC. O payload em cache vem da própria linha.
+        payload = _cached_payload(row[0], row[1])
+        with _token_cache_lock:
+            _token_cache[key] = payload
+        return payload
 
+    def _validate_signature(self, token_string: str) -> Optional[Dict[str, Any]]:
+        # Validação sem estado, usada só quando o banco não responde
+        try:
+            return jwt.decode(token_string, self._jwt_secret_b, algorithms=["HS256"])
         except jwt.ExpiredSignatureError:
             logger.warning("Token JWT expirado")
-            return False
+            return None
         except jwt.InvalidTokenError as e:
             logger.warning(f"Token JWT inválido: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Erro ao validar token: {e}")
-            return False
+            return None
+
+    def validate_tokens(self, tokens: List[str]) -> List[bool]:
+        # Valida vários tokens com uma única consulta ao banco; a ordem do resultado segue a da entrada
+        results: Dict[str, bool] = {}
+        pending = []
+        now = time.time()
+        with _token_cache_lock:
+            for token_string in tokens:
+                cached = _token_cache.get(_token_cache_key(token_string))
+                if cached is not None and cached.get('exp', 0) > now:
+                    results[token_string] = True
+                elif token_string not in results:
+                    results[token_string] = False
+                    pending.append(token_string)
+
+        if pending:
+            try:
+                with db.get_connection() as conn:
+                    with conn.cursor(cursor_factory=TupleCursor) as cursor:
+                        cursor.execute('''
+                            SELECT jwt_token, client_id, expires_at FROM public.auth_tokens 
+                            WHERE jwt_token = ANY(%s) AND expires_at > NOW()
+                        ''', (pending,))
+                        rows = cursor.fetchall()
+            except Exception as e:
+                logger.error(f"Erro ao validar tokens em lote, usando apenas a assinatura: {e}")
+                for token_string in pending:
+                    results[token_string] = self._validate_signature(token_string) is not None
+                return [results[token_string] for token_string in tokens]
+
+            with _token_cache_lock:
+                for token_string, client_id, expires_at in rows:
+                    _token_cache[_token_cache_key(token_string)] = _cached_payload(client_id, expires_at)
+                    results[token_string] = True
+
+        return [results[token_string] for token_string in tokens]
+
+    async def generate_token_async(self, client_id: str, client_secret: str) -> Dict[str, Any]:
+        # Assinatura HMAC + INSERT rodam numa thread do executor para não bloquear o event loop
+        return await asyncio.to_thread(self.generate_token, client_id, client_secret)
+
+    async def validate_token_async(self, token_string: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.validate_token, token_string)
 
     def get_valid_token(self, client_id: str) -> Optional[str]:
         
         try:
             with db.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute('''
-                        SELECT jwt_token FROM public.auth_tokens 
-                        WHERE client_id = %s AND expires_at > NOW() 
-                        ORDER BY created_at DESC LIMIT 1
-                    ''', (client_id,))
+                with conn.cursor(cursor_factory=TupleCursor) as cursor:
+                    db.execute_prepared(cursor, "sel_valid_token", (client_id,))
                     
                     result = cursor.fetchone()
-                    return result['jwt_token'] if result else None
+                    return result[0] if result else None
                     
         except Exception as e:
             logger.error(f"Erro ao buscar token válido: {e}")
             return None
 
-    def cleanup_expired_tokens(self) -> int:
+    def cleanup_expired_tokens(self, batch_size: int = 5000) -> int:
         
+        deleted_count = 0
         try:
+            # Apaga em lotes curtos para não segurar locks enquanto generate_token insere
             with db.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute('''
-                        DELETE FROM public.auth_tokens 
-                        WHERE expires_at <= NOW()
-                    ''')
-                    deleted_count = cursor.rowcount
-                    conn.commit()
+                    while True:
+                        cursor.execute('''
+                            DELETE FROM public.auth_tokens 
+                            WHERE ctid IN (
+                                SELECT ctid FROM public.auth_tokens
+                                WHERE expires_at <= NOW()
+                                LIMIT %s
+                            )
+                        ''', (batch_size,))
+                        batch_deleted = cursor.rowcount
+                        conn.commit()
+                        deleted_count += batch_deleted
+                        if batch_deleted < batch_size:
+                            break
                     
             if deleted_count > 0:
                 logger.info(f"Limpeza de tokens expirados: {deleted_count} tokens removidos")
@@ -173,5 +247,15 @@ class AuthTokenService:
             return 0
 
 
+_auth_token_service: Optional[AuthTokenService] = None
+_auth_token_service_lock = threading.Lock()
+
 
-auth_token_service = AuthTokenService()
\ No newline at end of file
+def get_auth_token_service() -> AuthTokenService:
+    # Instanciado sob demanda: importar o módulo não valida o ambiente
+    global _auth_token_service
+    if _auth_token_service is None:
+        with _auth_token_service_lock:
+            if _auth_token_service is None:
+                _auth_token_service = AuthTokenService()
+    return _auth_token_service
@@ -1,9 +1,11 @@
-import random
+import secrets
+import threading
 import uuid
-import string
 from datetime import datetime, date
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import logging
+from cachetools import TTLCache
+from psycopg2 import errors
 from app.database import db_primary, db_secondary
 
 logging.basicConfig(level=logging.INFO)
@@ -12,114 +14,85 @@ logger = logging.getLogger(__name__)
 class ClinicalExamService:
     def __init__(self):
         """Initialize the clinical exam service with multiple database connections."""
+        # Organizations rarely change; doctors/patients are cached briefly to absorb
+        # bursts of orders. Only successful lookups are cached.
+        self._org_cache = TTLCache(maxsize=1024, ttl=300)
+        self._identifier_cache = TTLCache(maxsize=4096, ttl=30)
+        self._cache_lock = threading.Lock()
         self._create_exam_orders_table_if_not_exists()
     
-    def _get_organization_id_by_name(self, organization_name: str) -> Optional[uuid.UUID]:
-        """Convert organization name to organization ID."""
-        try:
-            query = """
-                SELECT id FROM public.organizations 
-                WHERE name = %s AND deleted_at IS NULL
-            """
-            results = db_primary.execute_query(query, (organization_name,))
-            return results[0]['id'] if results else None
-        except Exception as e:
-            logger.error(f"Error finding organization by name: {e}")
-            raise
+    def invalidate_org(self, organization_name: str) -> None:
+        """Drop a cached organization ID (call when an organization is renamed or deleted)."""
+        with self._cache_lock:
+            self._org_cache.pop(organization_name, None)
     
-    def _get_doctor_id_by_identifier(self, identifier: str, organization_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+    def _resolve_order_participants(
+        self,
+        organization_name: str,
+        doctor_identifier: str,
+        patient_identifier: str
+    ) -> Tuple[Optional[uuid.UUID], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
         """
-        Convert CRM or DEA identifier to doctor ID.
+        Resolve organization, doctor and patient for a new exam order.
         
-        Args:
-            identifier: CRM registry (Brazil) or DEA registration (USA)
-            organization_id: Organization UUID
-            
-        Returns:
-            Doctor dictionary with ID or None if not found
-        """
-        try:
-            # First try to find by CRM (Brazilian doctors)
-            query_crm = """
-                SELECT id, full_name, crm_registry, dea_registration
-                FROM public.doctors 
-                WHERE crm_registry = %s AND organization_id = %s AND deleted_at IS NULL
-            """
-            results_crm = db_primary.execute_query(query_crm, (identifier, str(organization_id)))
-            
-            if results_crm:
-                logger.info(f"Doctor found by CRM: {identifier}")
-                doctor = results_crm[0]
-                doctor['registry_type'] = 'CRM'
-                return doctor
-            
-            # If not found by CRM, try by DEA registration (USA doctors)
-            query_dea = """
-                SELECT id, full_name, crm_registry, dea_registration
-                FROM public.doctors 
-                WHERE dea_registration = %s AND organization_id = %s AND deleted_at IS NULL
-            """
-            results_dea = db_primary.execute_query(query_dea, (identifier, str(organization_id)))
-            
-            if results_dea:
-                logger.info(f"Doctor found by DEA registration: {identifier}")
-                doctor = results_dea[0]
-                doctor['registry_type'] = 'DEA'
-                return doctor
-            
-            logger.warning(f"Doctor not found by CRM or DEA: {identifier}")
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error finding doctor by identifier: {e}")
-            raise
-    
-    def _get_patient_id_by_identifier(self, identifier: str, organization_id: uuid.UUID) -> Optional[Dict[str, Any]]:
-        """
-        Convert CPF or SSN identifier to patient ID.
+        Served from the lookup caches when all three are cached; otherwise a
+        single query on the primary database resolves them together.
         
-        Args:
-            identifier: CPF number (Brazil) or SSN (USA)
-            organization_id: Organization UUID
-            
         Returns:
-            Patient dictionary with ID or None if not found
+            (organization_id, doctor, patient); an entry is None when not found
         """
+        with self._cache_lock:
+            organization_id = self._org_cache.get(organization_name)
+            if organization_id is not None:
+                doctor = self._identifier_cache.get(('doctor', doctor_identifier, str(organization_id)))
+                patient = self._identifier_cache.get(('patient', patient_identifier, str(organization_id)))
+                if doctor is not None and patient is not None:
+                    return organization_id, dict(doctor), dict(patient)
+        
         try:
-            # First try to find by CPF (Brazilian patients)
-            query_cpf = """
-                SELECT id, name, cpf, ssn
-                FROM public.patients 
-                WHERE cpf = %s AND organization_id = %s AND deleted_at IS NULL
-            """
-            results_cpf = db_primary.execute_query(query_cpf, (identifier, organization_id))
-            
-            if results_cpf:
-                logger.info(f"Patient found by CPF: {identifier}")
-                patient = results_cpf[0]
-                patient['identifier_type'] = 'CPF'
-                return patient
-            
-            # If not found by CPF, try by SSN (USA patients)
-            query_ssn = """
-                SELECT id, name, cpf, ssn
-                FROM public.patients 
-                WHERE ssn = %s AND organization_id = %s AND deleted_at IS NULL
-            """
-            results_ssn = db_primary.execute_query(query_ssn, (identifier, organization_id))
-            
-            if results_ssn:
-                logger.info(f"Patient found by SSN: {identifier}")
-                patient = results_ssn[0]
-                patient['identifier_type'] = 'SSN'
-                return patient
-            
-            logger.warning(f"Patient not found by CPF or SSN: {identifier}")
-            return None
-            
+            with db_primary.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    db_primary.execute_prepared(
+                        cursor,
+                        "sel_exam_order_participants",
+                        (organization_name, doctor_identifier, patient_identifier)
+                    )
+                    row = cursor.fetchone()
         except Exception as e:
-            logger.error(f"Error finding patient by identifier: {e}")
+            logger.error(f"Error resolving exam order participants: {e}")
             raise
+        
+        if not row:
+            return None, None, None
+        
+        organization_id = row['organization_id']
+        doctor = patient = None
+        with self._cache_lock:
+            self._org_cache[organization_name] = organization_id
+            if row['doctor_id'] is not None:
+                doctor = {
+                    'id': row['doctor_id'],
+                    'full_name': row['full_name'],
+                    'crm_registry': row['crm_registry'],
+                    'dea_registration': row['dea_registration'],
+                    'registry_type': row['registry_type'],
+                }
+                self._identifier_cache[('doctor', doctor_identifier, str(organization_id))] = doctor
+            if row['patient_id'] is not None:
+                patient = {
+                    'id': row['patient_id'],
+                    'name': row['name'],
+                    'cpf': row['cpf'],
+                    'ssn': row['ssn'],
+                    'identifier_type': row['identifier_type'],
+                }
+                self._identifier_cache[('patient', patient_identifier, str(organization_id))] = patient
+        
+        if doctor:
+            logger.info(f"Doctor found by {doctor['registry_type']}: {doctor_identifier}")
+        if patient:
+            logger.info(f"Patient found by {patient['identifier_type']}: {patient_identifier}")
+        return organization_id, (dict(doctor) if doctor else None), (dict(patient) if patient else None)
 
     def _create_exam_orders_table_if_not_exists(self):
         """Create exam_orders table in secondary database if it doesn't exist."""
@@ -152,12 +125,15 @@ class ClinicalExamService:
         ]
         
         try:
-            # Create table in secondary database
-            db_secondary.execute_query(create_table_query, fetch=False)
-            
-            # Create indexes in secondary database
-            for index_query in create_index_queries:
-                db_secondary.execute_query(index_query, fetch=False)
+            with db_secondary.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Create table in secondary database
+                    cursor.execute(create_table_query)
+                    
+                    # Create indexes in secondary database
+                    for index_query in create_index_queries:
+                        cursor.execute(index_query)
+                conn.commit()
                 
             logger.info("Exam orders table created or verified successfully in secondary database")
         except Exception as e:
@@ -167,33 +143,15 @@ class ClinicalExamService:
     def _generate_exam_number_identification(self) -> str:
         """
         Generate a unique alphanumeric exam number identification.
-        Format: 20 characters (alphabetic + numeric)
+        Format: 20 uppercase hexadecimal characters (80 bits from the CSPRNG)
+        
+        Uniqueness is enforced by the UNIQUE index on exam_number_identification;
+        the collision probability is negligible, so no lookup is done here.
         
         Returns:
             Generated exam number identification string
         """
-        # Generate 20-character alphanumeric string
-        characters = string.ascii_uppercase + string.digits
-        exam_number = ''.join(random.choice(characters) for _ in range(20))
-        
-        # Verify uniqueness
-        try:
-            with db_secondary.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        "SELECT COUNT(*) FROM public.exam_orders WHERE exam_number_identification = %s",
-                        (exam_number,)
-                    )
-                    result = cursor.fetchone()
-                    if result['count'] > 0:
-                        logger.warning("Exam number collision detected, regenerating...")
-                        return self._generate_exam_number_identification()
-            
-            return exam_number
-        except Exception as e:
-            logger.error(f"Error generating exam number: {e}")
-            # Fallback: return generated number without uniqueness check
-            return exam_number
+        return secrets.token_hex(10).upper()
     
     def create_exam_order(
         self,
@@ -233,75 +191,81 @@ class ClinicalExamService:
             ValueError: If organization, doctor or patient not found
         """
         try:
-            # Convert organization_name to organization_id
-            organization_id = self._get_organization_id_by_name(organization_name)
+            # Convert organization_name, doctor_identifier and patient_identifier to IDs
+            organization_id, doctor, patient = self._resolve_order_participants(
+                organization_name, doctor_identifier, patient_identifier
+            )
             if not organization_id:
                 raise ValueError(f"Organization with name '{organization_name}' not found")
-            
-            # Convert doctor_identifier to doctor_id
-            doctor = self._get_doctor_id_by_identifier(doctor_identifier, organization_id)
             if not doctor:
                 raise ValueError(f"Doctor with identifier '{doctor_identifier}' not found in organization '{organization_name}'")
-            
-            # Convert patient_identifier to patient_id
-            patient = self._get_patient_id_by_identifier(patient_identifier, organization_id)
             if not patient:
                 raise ValueError(f"Patient with identifier '{patient_identifier}' not found in organization '{organization_name}'")
             
             # Validate and parse emission date
             emission_date_obj = datetime.strptime(emission_date, '%Y-%m-%d').date()
             
-            # Generate or validate exam number identification
-            if exam_number_identification is None:
+            # Generate exam number identification if not provided; duplicates are
+            # rejected by the UNIQUE index on insert
+            generated_number = exam_number_identification is None
+            if generated_number:
                 exam_number_identification = self._generate_exam_number_identification()
-            else:
-                existing_order = self.get_exam_order_by_exam_number(exam_number_identification)
-                if existing_order:
-                    raise ValueError(f"Exam number '{exam_number_identification}' already exists")
             
-            logger.info(f"Using exam number: {exam_number_identification}")
+            query = """
+                INSERT INTO public.exam_orders 
+                (id, created_at, updated_at, organization_id, doctor_id, patient_id, 
+                 exam_name, exam_description, emission_date, additional_details, priority,
+                 exam_number_identification)
+                VALUES (%s, NOW(), NOW(), %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id, created_at, updated_at, organization_id, doctor_id, patient_id,
+                          exam_name, exam_description, emission_date, additional_details,
+                          status, priority, exam_number_identification
+            """
             
             # Create exam order in secondary database
             exam_order_id = uuid.uuid4()
-            current_time = datetime.now()
             
             # Add registry/identifier types to additional details for tracking
             doctor_info = f"Doctor registry: {doctor['registry_type']} - {doctor_identifier}"
             patient_info = f"Patient identifier: {patient['identifier_type']} - {patient_identifier}"
-            exam_number_info = f"Exam Number: {exam_number_identification}"
-            
-            registry_details = f"{exam_number_info}\n{doctor_info}\n{patient_info}"
-            final_additional_details = additional_details
-            if additional_details:
-                final_additional_details = f"{registry_details}\n{additional_details}"
-            else:
-                final_additional_details = registry_details
-            
-            query = """
-                INSERT INTO public.exam_orders 
-                (id, created_at, updated_at, organization_id, doctor_id, patient_id, 
-                 exam_name, exam_description, emission_date, additional_details, priority,
-                 exam_number_identification)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
             
-            success = db_secondary.execute_query(
-                query,
-                (exam_order_id, current_time, current_time, organization_id, 
-                 doctor['id'], patient['id'], exam_name, exam_description, 
-                 emission_date_obj, final_additional_details, priority,
-                 exam_number_identification),
-                fetch=False
-            )
+            for attempt in range(2):
+                logger.info(f"Using exam number: {exam_number_identification}")
+                
+                exam_number_info = f"Exam Number: {exam_number_identification}"
+                registry_details = f"{exam_number_info}\n{doctor_info}\n{patient_info}"
+                if additional_details:
+                    final_additional_details = f"{registry_details}\n{additional_details}"
+                else:
+                    final_additional_details = registry_details
+                
+                try:
+                    with db_secondary.get_connection() as conn:
+                        with conn.cursor() as cursor:
+                            cursor.execute(
+                                query,
+                                (str(exam_order_id), str(organization_id),
+                                 doctor['id'], patient['id'], exam_name, exam_description,
+                                 emission_date_obj, final_additional_details, priority,
+                                 exam_number_identification)
+                            )
+                            exam_order = cursor.fetchone()
+                            conn.commit()
+                    break
+                except errors.UniqueViolation:
+                    if not generated_number:
+                        raise ValueError(f"Exam number '{exam_number_identification}' already exists")
+                    if attempt:
+                        raise
+                    logger.warning("Exam number collision detected, regenerating...")
+                    exam_number_identification = self._generate_exam_number_identification()
             
-            if success:
-                # Retrieve the complete exam order details
-                exam_order = self.get_exam_order_by_exam_number(exam_number_identification)
-                logger.info(f"Exam order created successfully with number: {exam_number_identification}")
-                return exam_order
-            else:
+            if not exam_order:
                 raise Exception("Failed to create exam order")
             
+            logger.info(f"Exam order created successfully with number: {exam_number_identification}")
+            return dict(exam_order)
+            
         except ValueError as e:
             logger.error(f"Invalid input: {e}")
             raise
@@ -338,8 +302,11 @@ class ClinicalExamService:
                 FROM public.exam_orders eo
                 WHERE eo.exam_number_identification = %s AND eo.deleted_at IS NULL
             """
-            results = db_secondary.execute_query(query, (exam_number_identification,))
-            return results[0] if results else None
+            with db_secondary.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, (exam_number_identification,))
+                    result = cursor.fetchone()
+            return dict(result) if result else None
             
         except Exception as e:
             logger.error(f"Error retrieving exam order by exam number: {e}")
@@ -10,6 +10,21 @@ class Config:
     DB_PASSWORD = os.getenv('DB_PASSWORD')
     DB_NAME = os.getenv('DB_NAME')
     DB_TIMEZONE = os.getenv('DB_TIMEZONE', 'UTC')
+    # psycopg2 pools close any returned connection once DB_POOL_MIN are idle, so a minimum
+    # below the maximum reconnects (and re-PREPAREs) on every checkout above it. The
+    # minimum therefore defaults to the maximum: every connection is opened when the pool
+    # is first used and kept. A lower DB_POOL_MIN trades that churn for fewer idle server
+    # connections.
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '50'))
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', str(DB_POOL_MAX)))
+    # Server-side PREPARE does not survive PgBouncer transaction pooling; set to false behind it
+    DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'true').lower() == 'true'
+    # Server-side timeouts for every pooled connection, in milliseconds (0 disables)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+    DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = int(os.getenv('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', '60000'))
+    DB_LOCK_TIMEOUT_MS = int(os.getenv('DB_LOCK_TIMEOUT_MS', '5000'))
+    # Commit audit rows without waiting for the WAL flush (faster, but a crash can drop the latest rows)
+    AUDIT_ASYNC_COMMIT = os.getenv('AUDIT_ASYNC_COMMIT', 'false').lower() == 'true'
 
     DBX_HOST = os.getenv('DBX_HOST', os.getenv('DB_HOST'))  # Default to primary DB host if not specified
     DBX_PORT = os.getenv('DBX_PORT', os.getenv('DB_PORT'))  # Default to primary DB port if not specified
@@ -17,6 +32,8 @@ class Config:
     DBX_PASSWORD = os.getenv('DBX_PASSWORD', os.getenv('DB_PASSWORD'))  # Default to primary DB password if not specified
     DBX_NAME = os.getenv('DBX_NAME', 'medical_dbx')  # Default database name for secondary DB
     DBX_TIMEZONE = os.getenv('DBX_TIMEZONE', 'UTC')
+    DBX_POOL_MAX = int(os.getenv('DBX_POOL_MAX', '20'))
+    DBX_POOL_MIN = int(os.getenv('DBX_POOL_MIN', str(DBX_POOL_MAX)))  # Same trade-off as DB_POOL_MIN
 
     @property
     def DATABASE_URL(self):
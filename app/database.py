@@ -1,114 +1,1124 @@
 import asyncio
+import itertools
+import json
+import re
+import threading
+import time
+import weakref
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from typing import Optional, Dict, Any, List
+from psycopg2.extensions import register_adapter
+from psycopg2.extras import (
+    Json, RealDictCursor, UUID_adapter, execute_values, register_default_json, register_default_jsonb
+)
+from psycopg2.pool import ThreadedConnectionPool
+from cachetools import TTLCache
+from typing import Optional, Dict, Any, List, Tuple, Iterator, Iterable
 from app.config import config
 import contextlib
+import csv
+import io
+import logging
 import uuid
+from datetime import datetime, timezone
 
+try:
+    import orjson
+except ImportError:  # optional: stdlib json decodes JSON columns otherwise
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# psycopg2 receives json/jsonb as text and parses it client-side; orjson does that
+# several times faster than json.loads on the wide audit and analysis documents
+if orjson is not None:
+    register_default_json(loads=orjson.loads, globally=True)
+    register_default_jsonb(loads=orjson.loads, globally=True)
+
+# uuid.UUID parameters are sent as typed '...'::uuid literals, so callers can pass them
+# as they are instead of formatting each one with str(). Only the adapter is registered:
+# uuid columns still come back as strings, as the services expect.
+register_adapter(uuid.UUID, UUID_adapter)
+
+
+def _json_default(obj):
+    """Fallback for values neither encoder handles natively (Decimal, ...)"""
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return str(obj)
+
+
+class JsonParam(Json):
+    """Json adapter that serializes its value once, with orjson when it is installed
+    
+    psycopg2's Json calls dumps every time the parameter is quoted; the encoded text
+    is kept here so large payloads are not re-encoded. Both encoders take the same
+    inputs: datetimes as ISO strings, UUIDs and other values through str(), and
+    non-string dict keys.
+    """
+    
+    def __init__(self, adapted):
+        super().__init__(adapted)
+        self._encoded = None
+    
+    def dumps(self, obj):
+        if self._encoded is None:
+            if orjson is not None:
+                self._encoded = orjson.dumps(
+                    obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS
+                ).decode()
+            else:
+                self._encoded = json.dumps(obj, default=_json_default)
+        return self._encoded
+
+__all__ = ['Database', 'db', 'db_primary', 'db_secondary']
+
+# Indexes created at startup by Database.init_db
+INDEX_DDL = [
+    # Doctor lookup by CRM or DEA registration (clinical_service)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_org_crm "
+    "ON public.doctors (organization_id, crm_registry) WHERE deleted_at IS NULL",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_org_dea "
+    "ON public.doctors (organization_id, dea_registration) WHERE deleted_at IS NULL",
+    # Patient lookup by CPF or SSN (clinical_service)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_patients_org_cpf "
+    "ON public.patients (organization_id, cpf) WHERE deleted_at IS NULL",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_patients_org_ssn "
+    "ON public.patients (organization_id, ssn) WHERE deleted_at IS NULL",
+    # Case-insensitive organization lookup (organization_exists, get_organization_id,
+    # audit by organization)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_organizations_name_ci "
+    "ON public.organizations (LOWER(TRIM(name)))",
+    # Exact lookup of active organizations (sel_org_id_by_name, get_active_organization_id)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_organizations_name_active "
+    "ON public.organizations (name) WHERE deleted_at IS NULL",
+    # Active exam scheduling by organization and exam name
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_scheduling_org_name_active "
+    "ON public.exam_scheduling (organization_id, exam_name) WHERE deleted_at IS NULL",
+    # Keyset pagination of an organization's exam scheduling (list_exams_by_organization)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_scheduling_org_date_id "
+    "ON public.exam_scheduling (organization_id, scheduled_date, id) WHERE deleted_at IS NULL",
+    # Upcoming scheduled exams (get_upcoming_exams)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_scheduling_org_upcoming "
+    "ON public.exam_scheduling (organization_id, scheduled_date) INCLUDE (id, exam_name, patient_id) "
+    "WHERE deleted_at IS NULL AND status = 'scheduled'",
+    # Per-status statistics (get_exam_statistics)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_scheduling_org_status_date "
+    "ON public.exam_scheduling (organization_id, status, scheduled_date) WHERE deleted_at IS NULL",
+    # Expired-token sweep (auth_service.cleanup_expired_tokens)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_auth_tokens_expires_at "
+    "ON public.auth_tokens (expires_at) WHERE expires_at IS NOT NULL",
+    # Keyset pagination of audit history (exam_analysis_audit_service)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_analyses_audit_changed_id "
+    "ON public.exam_analyses_audit (changed_at DESC, id DESC)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_analyses_audit_analysis_changed_id "
+    "ON public.exam_analyses_audit (exam_analyses_id, changed_at DESC, id DESC)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_analyses_audit_user_changed_id "
+    "ON public.exam_analyses_audit (db_user, changed_at DESC, id DESC)",
+    # Wide changed_at ranges (audit by date range totals); the audit table is append-only,
+    # so a BRIN index stays tiny
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_analyses_audit_changed_brin "
+    "ON public.exam_analyses_audit USING BRIN (changed_at) WITH (pages_per_range = 32)",
+    # Analyses of an organization (audit by organization join)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_analyses_org "
+    "ON public.exam_analyses (organizations_id)",
+    # Organization analysis pages in their sort order, so neither OFFSET nor keyset
+    # pages need a sort (get_organization_analyses)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_analyses_org_date "
+    "ON public.exam_analyses (organizations_id, exam_date DESC, created_at DESC, id DESC) "
+    "INCLUDE (exam_type)",
+    # Exam type filter and the per-type counts of get_analysis_statistics
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_analyses_org_type_date "
+    "ON public.exam_analyses (organizations_id, exam_type, exam_date DESC, created_at DESC, id DESC)",
+    # Analyses still waiting for a result (get_analyses_without_exam_result)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exam_analyses_org_pending "
+    "ON public.exam_analyses (organizations_id, exam_date DESC, created_at DESC, id DESC) "
+    "WHERE exam_result IS NULL",
+    # Exam listing pages in their sort order, OFFSET and keyset alike (EXAM_LISTING_ORDER);
+    # the rest of EXAM_LIST_COLUMNS is included so pages are index-only scans
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_medical_exams_org_listing "
+    "ON public.medical_exams (organization_id, COALESCE(requested_at, '-infinity'::date) DESC, "
+    "created_at DESC, id DESC) INCLUDE (requested_at, patient_id, exam_type, status, updated_at) "
+    "WHERE deleted_at IS NULL",
+    # requested_at ranges (sel_exams_requested_between); status is included so the
+    # per-status counts are answered from the index alone (sel_exam_status_counts)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_medical_exams_org_requested "
+    "ON public.medical_exams (organization_id, requested_at DESC NULLS LAST, created_at DESC) "
+    "INCLUDE (status) WHERE deleted_at IS NULL",
+    # A patient's exams (sel_exams_page with a patient name)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_medical_exams_patient_requested "
+    "ON public.medical_exams (patient_id, COALESCE(requested_at, '-infinity'::date) DESC, "
+    "created_at DESC, id DESC) WHERE deleted_at IS NULL",
+    # Active user lookup by organization and email (get_user_by_email_and_org)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_org_email_active "
+    "ON public.users (organization_id, email) WHERE deleted_at IS NULL",
+]
+
+# Pooled connections idle longer than this are pinged before being handed out
+PRE_PING_IDLE_SECONDS = 30
+
+# Columns returned for exam scheduling rows
+EXAM_SCHEDULING_FIELDS = (
+    "id", "organization_id", "patient_id", "exam_name", "exam_description",
+    "scheduled_date", "scheduled_end_date", "exam_duration_minutes", "status",
+    "max_participants", "location", "instructions", "created_at", "updated_at",
+)
+EXAM_SCHEDULING_COLUMNS = ", ".join(EXAM_SCHEDULING_FIELDS)
+
+# Same columns for reads joined with the organization and patient names
+EXAM_SCHEDULING_SELECT = (
+    ", ".join(f"es.{field}" for field in EXAM_SCHEDULING_FIELDS)
+    + ", o.name AS organization_name, p.name AS patient_name"
+)
+EXAM_SCHEDULING_JOINS = (
+    "JOIN public.organizations o ON o.id = es.organization_id "
+    "LEFT JOIN public.patients p ON p.id = es.patient_id"
+)
+
+# Fields update_exam_scheduling accepts, in the order of upd_exam_scheduling's parameters
+EXAM_SCHEDULING_UPDATABLE_FIELDS = (
+    "exam_description", "scheduled_date", "scheduled_end_date", "exam_duration_minutes",
+    "status", "max_participants", "location", "instructions",
+)
+
+# list_exams_by_organization variants keyed by (status filter, keyset cursor)
+_LIST_EXAMS_SQL = {
+    (has_status, has_cursor): (
+        f"SELECT {EXAM_SCHEDULING_SELECT} "
+        f"FROM public.exam_scheduling es {EXAM_SCHEDULING_JOINS} "
+        "WHERE es.organization_id = %s AND es.deleted_at IS NULL"
+        + (" AND es.status = %s" if has_status else "")
+        + (" AND (es.scheduled_date, es.id) > (%s, %s)" if has_cursor else "")
+        + " ORDER BY es.scheduled_date, es.id LIMIT %s"
+        + ("" if has_cursor else " OFFSET %s")
+    )
+    for has_status in (False, True)
+    for has_cursor in (False, True)
+}
+
+_UPCOMING_EXAMS_SQL = (
+    f"SELECT {EXAM_SCHEDULING_SELECT} "
+    f"FROM public.exam_scheduling es {EXAM_SCHEDULING_JOINS} "
+    "WHERE es.organization_id = %s AND es.deleted_at IS NULL AND es.status = 'scheduled' "
+    "AND es.scheduled_date BETWEEN NOW() AND NOW() + make_interval(hours => %s) "
+    "ORDER BY es.scheduled_date ASC"
+)
+
+# Summary columns of audit history listings ({a} is the table alias prefix, e.g. "a.");
+# the JSONB snapshots are only read by exam_analysis_audit_service.get_audit_detail
+AUDIT_SUMMARY_COLUMNS = (
+    "{a}id, {a}exam_analyses_id, {a}action_type, {a}changed_at, {a}application_name, {a}db_user, "
+    "{a}old_data IS NOT NULL AS has_old_data, {a}new_data IS NOT NULL AS has_new_data"
+)
+AUDIT_TOTAL_COUNT_COLUMN = ", COUNT(*) OVER () AS total_count"
+
+
+def _audit_total_count_column(from_where: str, has_cursor: bool) -> str:
+    # A window count on a keyset page would only see the rows after the cursor, so those
+    # pages count the whole listing in a scalar subquery instead
+    if has_cursor:
+        return f", (SELECT COUNT(*) {from_where}) AS total_count"
+    return AUDIT_TOTAL_COUNT_COLUMN
+
+
+def _audit_listing_sql(where: str, next_param: int, has_cursor: bool, with_count: bool = False) -> str:
+    # Newest-first audit page; keyset variants take the cursor instead of an OFFSET
+    sql = f"SELECT {AUDIT_SUMMARY_COLUMNS.format(a='')}"
+    if with_count:
+        sql += _audit_total_count_column(f"FROM public.exam_analyses_audit WHERE {where}", has_cursor)
+    sql += f" FROM public.exam_analyses_audit WHERE {where}"
+    if has_cursor:
+        sql += f" AND (changed_at, id) < (${next_param}, ${next_param + 1})"
+        next_param += 2
+    sql += f" ORDER BY changed_at DESC, id DESC LIMIT ${next_param}"
+    if not has_cursor:
+        sql += f" OFFSET ${next_param + 1}"
+    return sql
+
+
+def audit_by_organization_statement(has_start: bool, has_end: bool, has_action: bool,
+                                    has_cursor: bool, with_count: bool) -> str:
+    """Name of the prepared audit-by-organization listing for a filter combination"""
+    return (
+        "sel_audit_by_org"
+        + ("_from" if has_start else "")
+        + ("_until" if has_end else "")
+        + ("_action" if has_action else "")
+        + ("_after" if has_cursor else "")
+        + ("_counted" if with_count else "")
+    )
+
+
+def audit_by_organization_count_statement(has_start: bool, has_end: bool, has_action: bool) -> str:
+    """Name of the prepared audit-by-organization total for a filter combination"""
+    return audit_by_organization_statement(has_start, has_end, has_action, False, False).replace(
+        "sel_audit_by_org", "cnt_audit_by_org", 1
+    )
+
+
+def _audit_by_organization_from_where(has_start: bool, has_end: bool, has_action: bool) -> Tuple[str, int]:
+    # FROM/WHERE of an organization's audit listing and the next free parameter number
+    conditions = ["LOWER(TRIM(o.name)) = LOWER(TRIM($1))", "o.deleted_at IS NULL"]
+    next_param = 2
+    for enabled, condition in ((has_start, "a.changed_at >= ${}"),
+                               (has_end, "a.changed_at <= ${}"),
+                               (has_action, "a.action_type = ${}")):
+        if enabled:
+            conditions.append(condition.format(next_param))
+            next_param += 1
+    from_where = (
+        "FROM public.exam_analyses_audit a "
+        "JOIN public.exam_analyses ea ON a.exam_analyses_id = ea.id "
+        "JOIN public.organizations o ON o.id = ea.organizations_id "
+        f"WHERE {' AND '.join(conditions)}"
+    )
+    return from_where, next_param
+
+
+def _audit_by_organization_sql(has_start: bool, has_end: bool, has_action: bool,
+                               has_cursor: bool, with_count: bool) -> str:
+    # The organization is resolved in the same statement, so a page is a single round trip
+    from_where, next_param = _audit_by_organization_from_where(has_start, has_end, has_action)
+    page_from_where = from_where
+    if has_cursor:
+        page_from_where += f" AND (a.changed_at, a.id) < (${next_param}, ${next_param + 1})"
+        next_param += 2
+    sql = (
+        f"SELECT {AUDIT_SUMMARY_COLUMNS.format(a='a.')}, ea.exam_type"
+        + (_audit_total_count_column(from_where, has_cursor) if with_count else "")
+        + f" {page_from_where} "
+        f"ORDER BY a.changed_at DESC, a.id DESC LIMIT ${next_param}"
+    )
+    if not has_cursor:
+        sql += f" OFFSET ${next_param + 1}"
+    return sql
+
+
+EXAM_ANALYSIS_WRITE_COLUMNS = (
+    "id, organizations_id, exam_type, exam_date, analysis_date, created_at, updated_at"
+)
+
+
+def analysis_page_statement(has_exam_type: bool, has_start: bool, has_end: bool,
+                            without_result: bool, has_cursor: bool, with_count: bool) -> str:
+    """Name of the prepared organization analysis page for a filter combination"""
+    return (
+        "sel_org_analyses"
+        + ("_type" if has_exam_type else "")
+        + ("_from" if has_start else "")
+        + ("_until" if has_end else "")
+        + ("_pending" if without_result else "")
+        + ("_after" if has_cursor else "")
+        + ("_counted" if with_count else "")
+    )
+
+
+def _analysis_page_sql(has_exam_type: bool, has_start: bool, has_end: bool,
+                       without_result: bool, has_cursor: bool, with_count: bool) -> str:
+    # One page of an organization's analyses with the organization resolved by name in the
+    # same statement. No rows: the organization does not exist; an existing organization
+    # with an empty page yields a single all-NULL row. Keyset variants take the
+    # (exam_date, created_at, id) cursor instead of an OFFSET. Counted variants carry the
+    # whole listing's total on every row, the empty-page row included, so neither a page
+    # past the end nor a cursor changes what total_count means.
+    conditions = ["ea.organizations_id = org.id"]
+    next_param = 2
+    for enabled, condition in ((has_exam_type, "ea.exam_type = ${}"),
+                               (has_start, "ea.exam_date >= ${}"),
+                               (has_end, "ea.exam_date <= ${}")):
+        if enabled:
+            conditions.append(condition.format(next_param))
+            next_param += 1
+    if without_result:
+        conditions.append("ea.exam_result IS NULL")
+    # A CTE rather than a scalar subquery, which would be re-run for every row since it
+    # refers to org
+    count_cte = (
+        ", total AS (SELECT COUNT(*) AS total_count FROM org, public.exam_analyses ea "
+        f"WHERE {' AND '.join(conditions)})"
+        if with_count else ""
+    )
+    if has_cursor:
+        conditions.append(
+            f"(ea.exam_date, ea.created_at, ea.id) < (${next_param}, ${next_param + 1}, ${next_param + 2})"
+        )
+        next_param += 3
+    sql = (
+        "WITH org AS ("
+        "SELECT id FROM public.organizations WHERE name = $1 AND deleted_at IS NULL LIMIT 1"
+        f"){count_cte} SELECT page.*"
+        + (", total.total_count FROM org CROSS JOIN total" if with_count else " FROM org")
+        + " LEFT JOIN LATERAL ("
+        "SELECT ea.* FROM public.exam_analyses ea "
+        f"WHERE {' AND '.join(conditions)} "
+        "ORDER BY ea.exam_date DESC, ea.created_at DESC, ea.id DESC "
+        f"LIMIT ${next_param}"
+    )
+    if not has_cursor:
+        sql += f" OFFSET ${next_param + 1}"
+    return sql + ") page ON TRUE"
+
+
+# Organization ($1, by name) and patient ($2, by name within that organization) for
+# the exam statements. pat keeps up to two matches so an ambiguous name can be told
+# apart from a unique one.
+EXAM_ORG_PATIENT_CTE = (
+    "org AS ("
+    "SELECT id FROM public.organizations WHERE name = $1 AND deleted_at IS NULL LIMIT 1"
+    "), "
+    "pat AS ("
+    "SELECT id FROM public.patients "
+    "WHERE $2::text IS NOT NULL AND name = $2 "
+    "AND organization_id = (SELECT id FROM org) AND deleted_at IS NULL "
+    "LIMIT 2"
+    ")"
+)
+EXAM_ORG_PATIENT_CHECK_COLUMNS = (
+    "EXISTS (SELECT 1 FROM org) AS organization_found, "
+    "(SELECT COUNT(*) FROM pat) AS patient_matches"
+)
+# Columns of exam listing rows; notes and the soft-delete columns only come with single exams
+EXAM_LIST_COLUMNS = (
+    "id, organization_id, patient_id, exam_type, status, requested_at, created_at, updated_at"
+)
+# Exam listing filters after EXAM_ORG_PATIENT_CTE: patient name $2, status $3, exam type $4
+# and the requested_at range $5..$6. Every filter is always bound (NULL when absent), so each
+# listing is one fixed statement instead of one text per filter combination.
+EXAM_LISTING_WHERE = (
+    "organization_id = (SELECT id FROM org) AND deleted_at IS NULL "
+    "AND ($2::text IS NULL OR patient_id IN (SELECT id FROM pat)) "
+    "AND ($3::text IS NULL OR status = $3) "
+    "AND ($4::text IS NULL OR exam_type = $4) "
+    "AND ($5::date IS NULL OR requested_at >= $5) "
+    "AND ($6::date IS NULL OR requested_at <= $6)"
+)
+# requested_at DESC NULLS LAST, spelled so that the (requested_at, created_at, id)
+# keyset is a single row comparison idx_medical_exams_org_listing can seek to
+EXAM_LISTING_SORT_KEY = "COALESCE(requested_at, '-infinity'::date), created_at, id"
+EXAM_LISTING_ORDER = "COALESCE(requested_at, '-infinity'::date) DESC, created_at DESC, id DESC"
+
+
+# Hot-path statements, PREPAREd once per pooled connection by Database.execute_prepared
+PREPARED_STATEMENTS = {
+    # auth_service
+    "ins_auth_token": (
+        "INSERT INTO public.auth_tokens "
+        "(id, client_id, jwt_token, expires_at, created_at, updated_at) "
+        "VALUES ($1, $2, $3, $4, $5, $6)"
+    ),
+    "sel_auth_token": (
+        "SELECT client_id, expires_at FROM public.auth_tokens "
+        "WHERE jwt_token = $1 AND expires_at > NOW() LIMIT 1"
+    ),
+    "sel_valid_token": (
+        "SELECT jwt_token FROM public.auth_tokens "
+        "WHERE client_id = $1 AND expires_at > NOW() "
+        "ORDER BY created_at DESC LIMIT 1"
+    ),
+    # clinical_service
+    "sel_org_id_by_name": (
+        "SELECT id FROM public.organizations WHERE name = $1 AND deleted_at IS NULL"
+    ),
+    # Database lookups
+    "org_exists": (
+        "SELECT EXISTS (SELECT 1 FROM public.organizations "
+        "WHERE LOWER(TRIM(name)) = LOWER(TRIM($1))) AS exists"
+    ),
+    "sel_org_by_name_ci": (
+        "SELECT id, name FROM public.organizations WHERE LOWER(TRIM(name)) = LOWER(TRIM($1))"
+    ),
+    "sel_user_by_email_and_org": (
+        "SELECT id, name, email, password, role, organization_id, created_at "
+        "FROM public.users "
+        "WHERE email = $1 AND organization_id = $2 AND deleted_at IS NULL"
+    ),
+    "sel_user_by_id": (
+        "SELECT id, name, email, password, role, organization_id, created_at "
+        "FROM public.users WHERE id = $1 AND deleted_at IS NULL"
+    ),
+    "ins_user": (
+        "INSERT INTO public.users (id, name, email, password, role, organization_id, created_at, updated_at) "
+        "VALUES (gen_random_uuid(), $1, $2, $3, $4, $5, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP) "
+        "RETURNING id, name, email, role, created_at, updated_at"
+    ),
+    "sel_exam_by_secure_identifier": (
+        f"SELECT {EXAM_SCHEDULING_SELECT} "
+        f"FROM public.exam_scheduling es {EXAM_SCHEDULING_JOINS} "
+        "WHERE es.exam_name = $1 AND es.organization_id = $2 AND es.deleted_at IS NULL "
+        "LIMIT 1"
+    ),
+    # One fixed UPDATE for every change set; absent fields are bound as NULL and keep their value
+    "upd_exam_scheduling": (
+        "WITH es AS ("
+        "UPDATE public.exam_scheduling SET "
+        + ", ".join(
+            f"{field} = COALESCE(${position}, {field})"
+            for position, field in enumerate(EXAM_SCHEDULING_UPDATABLE_FIELDS, start=1)
+        )
+        + ", updated_at = CURRENT_TIMESTAMP "
+        f"WHERE exam_name = ${len(EXAM_SCHEDULING_UPDATABLE_FIELDS) + 1} "
+        f"AND organization_id = ${len(EXAM_SCHEDULING_UPDATABLE_FIELDS) + 2} "
+        f"AND deleted_at IS NULL RETURNING {EXAM_SCHEDULING_COLUMNS}"
+        f") SELECT {EXAM_SCHEDULING_SELECT} FROM es {EXAM_SCHEDULING_JOINS}"
+    ),
+    # exam_analysis_audit_service
+    "ins_audit_row": (
+        "INSERT INTO public.exam_analyses_audit "
+        "(exam_analyses_id, action_type, old_data, new_data, changed_fields, application_name) "
+        "VALUES ($1, $2, $3, $4, $5::text[], $6)"
+    ),
+    "sel_analysis_org_id": (
+        "SELECT organizations_id FROM public.exam_analyses WHERE id = $1"
+    ),
+    # exam_analysis_service; writes return the scalar columns only, the service fills in
+    # the jsonb payloads the caller sent instead of reading them back
+    "ins_exam_analysis": (
+        "INSERT INTO public.exam_analyses "
+        "(organizations_id, exam_type, exam_date, original_results, exam_result, observations, "
+        "analysis_date, created_at, updated_at) "
+        # Parameters in a SELECT list are not typed from the target columns, hence the casts
+        "SELECT o.id, $2::text, $3::timestamptz, $4::jsonb, $5::jsonb, $6::jsonb, "
+        "CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP "
+        "FROM (SELECT id FROM public.organizations WHERE name = $1 AND deleted_at IS NULL LIMIT 1) o "
+        f"RETURNING {EXAM_ANALYSIS_WRITE_COLUMNS}"
+    ),
+    "sel_exam_analysis": (
+        "SELECT * FROM public.exam_analyses WHERE id = $1"
+    ),
+    "upd_exam_analysis": (
+        "UPDATE public.exam_analyses SET "
+        "exam_type = COALESCE($1, exam_type), "
+        "exam_date = COALESCE($2, exam_date), "
+        "original_results = COALESCE($3::jsonb, original_results), "
+        "exam_result = COALESCE($4::jsonb, exam_result), "
+        "observations = COALESCE($5::jsonb, observations), "
+        "updated_at = CURRENT_TIMESTAMP "
+        f"WHERE id = $6 RETURNING {EXAM_ANALYSIS_WRITE_COLUMNS}, "
+        # Stored payloads come back only for the fields left unchanged. The casts are
+        # needed for PREPARE: RETURNING is typed before SET, so a bare $3 has no type.
+        "CASE WHEN $3::jsonb IS NULL THEN original_results END AS original_results, "
+        "CASE WHEN $4::jsonb IS NULL THEN exam_result END AS exam_result, "
+        "CASE WHEN $5::jsonb IS NULL THEN observations END AS observations"
+    ),
+    "del_exam_analysis": (
+        "DELETE FROM public.exam_analyses WHERE id = $1 RETURNING organizations_id"
+    ),
+    # One statement per filter combination, see analysis_page_statement
+    **{
+        analysis_page_statement(*flags): _analysis_page_sql(*flags)
+        for flags in itertools.product((False, True), repeat=6)
+    },
+    # Audit listings; "_after" variants page by (changed_at, id) cursor,
+    # "_counted" variants also return the window total
+    "sel_audit_for_analysis": _audit_listing_sql("exam_analyses_id = $1", 2, False),
+    "sel_audit_for_analysis_after": _audit_listing_sql("exam_analyses_id = $1", 2, True),
+    "sel_audit_by_user": _audit_listing_sql("db_user = $1", 2, False),
+    "sel_audit_by_user_after": _audit_listing_sql("db_user = $1", 2, True),
+    "sel_audit_by_date_range": _audit_listing_sql("changed_at >= $1 AND changed_at <= $2", 3, False),
+    "sel_audit_by_date_range_after": _audit_listing_sql("changed_at >= $1 AND changed_at <= $2", 3, True),
+    "sel_audit_by_date_range_counted": _audit_listing_sql(
+        "changed_at >= $1 AND changed_at <= $2", 3, False, with_count=True
+    ),
+    "sel_audit_by_date_range_after_counted": _audit_listing_sql(
+        "changed_at >= $1 AND changed_at <= $2", 3, True, with_count=True
+    ),
+    # Totals for a page that has no row to read them from (past the end or the last cursor)
+    "cnt_audit_by_date_range": (
+        "SELECT COUNT(*) AS total FROM public.exam_analyses_audit "
+        "WHERE changed_at >= $1 AND changed_at <= $2"
+    ),
+    **{
+        audit_by_organization_count_statement(*flags):
+            f"SELECT COUNT(*) AS total {_audit_by_organization_from_where(*flags)[0]}"
+        for flags in itertools.product((False, True), repeat=3)
+    },
+    # One statement per filter combination, see audit_by_organization_statement
+    **{
+        audit_by_organization_statement(*flags): _audit_by_organization_sql(*flags)
+        for flags in itertools.product((False, True), repeat=5)
+    },
+    "sel_audit_detail": (
+        "SELECT id, exam_analyses_id, action_type, old_data, new_data, "
+        "changed_fields, application_name, db_user, changed_at "
+        "FROM public.exam_analyses_audit WHERE id = $1"
+    ),
+    # Organization, doctor and patient for a new exam order in one round trip
+    "sel_exam_order_participants": (
+        "SELECT o.id AS organization_id, "
+        "d.id AS doctor_id, d.full_name, d.crm_registry, d.dea_registration, d.registry_type, "
+        "p.id AS patient_id, p.name, p.cpf, p.ssn, p.identifier_type "
+        "FROM public.organizations o "
+        "LEFT JOIN LATERAL ("
+        "SELECT id, full_name, crm_registry, dea_registration, "
+        "CASE WHEN crm_registry = $2 THEN 'CRM' ELSE 'DEA' END AS registry_type "
+        "FROM public.doctors "
+        "WHERE (crm_registry = $2 OR dea_registration = $2) "
+        "AND organization_id = o.id AND deleted_at IS NULL "
+        "ORDER BY (crm_registry = $2) IS TRUE DESC LIMIT 1"
+        ") d ON TRUE "
+        "LEFT JOIN LATERAL ("
+        "SELECT id, name, cpf, ssn, "
+        "CASE WHEN cpf = $3 THEN 'CPF' ELSE 'SSN' END AS identifier_type "
+        "FROM public.patients "
+        "WHERE (cpf = $3 OR ssn = $3) "
+        "AND organization_id = o.id AND deleted_at IS NULL "
+        "ORDER BY (cpf = $3) IS TRUE DESC LIMIT 1"
+        ") p ON TRUE "
+        "WHERE o.name = $1 AND o.deleted_at IS NULL"
+    ),
+    # exam_service
+    "ins_exam": (
+        f"WITH {EXAM_ORG_PATIENT_CTE}, "
+        "ins AS ("
+        "INSERT INTO public.medical_exams "
+        "(organization_id, patient_id, exam_type, status, requested_at, notes, created_at, updated_at) "
+        "SELECT org.id, (SELECT id FROM pat LIMIT 1), $3::text, $4::text, $5::date, $6::text, "
+        "CURRENT_TIMESTAMP, CURRENT_TIMESTAMP "
+        "FROM org "
+        # Nothing is inserted unless the patient name, when given, matches exactly one patient
+        "WHERE $2::text IS NULL OR (SELECT COUNT(*) FROM pat) = 1 "
+        "RETURNING *"
+        ") "
+        f"SELECT {EXAM_ORG_PATIENT_CHECK_COLUMNS}, ins.* FROM (SELECT 1) AS one LEFT JOIN ins ON TRUE"
+    ),
+    "sel_exam": (
+        "SELECT * FROM public.medical_exams WHERE id = $1 AND deleted_at IS NULL"
+    ),
+    # One fixed UPDATE for every change set; absent fields are bound as NULL and keep their value
+    # The patient ($5) is looked up in the organization of the exam being updated ($6)
+    "upd_exam": (
+        "WITH e AS ("
+        "SELECT organization_id FROM public.medical_exams WHERE id = $6 AND deleted_at IS NULL"
+        "), "
+        "pat AS ("
+        "SELECT id FROM public.patients "
+        "WHERE $5::text IS NOT NULL AND name = $5 "
+        "AND organization_id = (SELECT organization_id FROM e) AND deleted_at IS NULL "
+        "LIMIT 2"
+        "), "
+        "upd AS ("
+        "UPDATE public.medical_exams SET "
+        "exam_type = COALESCE($1, exam_type), "
+        "status = COALESCE($2, status), "
+        "requested_at = COALESCE($3, requested_at), "
+        "notes = COALESCE($4, notes), "
+        "patient_id = COALESCE((SELECT id FROM pat LIMIT 1), patient_id), "
+        "updated_at = CURRENT_TIMESTAMP "
+        "WHERE id = $6 AND deleted_at IS NULL "
+        "AND ($5::text IS NULL OR (SELECT COUNT(*) FROM pat) = 1) "
+        "RETURNING *"
+        ") "
+        "SELECT EXISTS (SELECT 1 FROM e) AS exam_found, "
+        "(SELECT COUNT(*) FROM pat) AS patient_matches, upd.* "
+        "FROM (SELECT 1) AS one LEFT JOIN upd ON TRUE"
+    ),
+    "del_exam": (
+        "UPDATE public.medical_exams "
+        "SET deleted_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP "
+        "WHERE id = $1 AND deleted_at IS NULL"
+    ),
+    "restore_exam": (
+        "UPDATE public.medical_exams "
+        "SET deleted_at = NULL, updated_at = CURRENT_TIMESTAMP "
+        "WHERE id = $1 AND deleted_at IS NOT NULL RETURNING *"
+    ),
+    "upd_exam_status": (
+        "UPDATE public.medical_exams SET status = $1, updated_at = CURRENT_TIMESTAMP "
+        "WHERE id = $2 AND deleted_at IS NULL"
+    ),
+    "upd_exam_status_bulk": (
+        "UPDATE public.medical_exams SET status = $1, updated_at = CURRENT_TIMESTAMP "
+        "WHERE id = ANY($2::uuid[]) AND deleted_at IS NULL RETURNING id"
+    ),
+    "sel_exams_count": (
+        f"WITH {EXAM_ORG_PATIENT_CTE} "
+        f"SELECT {EXAM_ORG_PATIENT_CHECK_COLUMNS}, COUNT(*) AS total "
+        f"FROM public.medical_exams WHERE {EXAM_LISTING_WHERE}"
+    ),
+    # The page with its window total and the lookup checks; an empty page yields a
+    # single row whose exam columns are all NULL
+    "sel_exams_page": (
+        f"WITH {EXAM_ORG_PATIENT_CTE} "
+        f"SELECT {EXAM_ORG_PATIENT_CHECK_COLUMNS}, page.* "
+        "FROM (SELECT 1) AS one LEFT JOIN LATERAL ("
+        f"SELECT {EXAM_LIST_COLUMNS}, COUNT(*) OVER () AS total_count "
+        f"FROM public.medical_exams WHERE {EXAM_LISTING_WHERE} "
+        f"ORDER BY {EXAM_LISTING_ORDER} "
+        "LIMIT $7 OFFSET $8"
+        ") page ON TRUE"
+    ),
+    # Keyset variant: the page after the ($8 requested_at, $9 created_at, $10 id) cursor;
+    # the total is counted separately since a window count would start at the cursor
+    "sel_exams_page_after": (
+        f"WITH {EXAM_ORG_PATIENT_CTE} "
+        f"SELECT {EXAM_ORG_PATIENT_CHECK_COLUMNS}, "
+        f"(SELECT COUNT(*) FROM public.medical_exams WHERE {EXAM_LISTING_WHERE}) AS total_count, "
+        "page.* "
+        "FROM (SELECT 1) AS one LEFT JOIN LATERAL ("
+        f"SELECT {EXAM_LIST_COLUMNS} FROM public.medical_exams WHERE {EXAM_LISTING_WHERE} "
+        f"AND ({EXAM_LISTING_SORT_KEY}) < (COALESCE($8::date, '-infinity'::date), $9, $10) "
+        f"ORDER BY {EXAM_LISTING_ORDER} "
+        "LIMIT $7"
+        ") page ON TRUE"
+    ),
+    "sel_exams_requested_between": (
+        f"SELECT {EXAM_LIST_COLUMNS}, COUNT(*) OVER () AS total_count FROM public.medical_exams "
+        "WHERE organization_id = $1 AND deleted_at IS NULL "
+        "AND requested_at >= $2 AND requested_at <= $3 "
+        # The range excludes NULLs anyway; NULLS FIRST lets idx_medical_exams_org_requested
+        # be read backwards instead of sorting
+        "ORDER BY requested_at ASC NULLS FIRST LIMIT $4 OFFSET $5"
+    ),
+    "sel_exams_requested_between_count": (
+        "SELECT COUNT(*) AS total FROM public.medical_exams "
+        "WHERE organization_id = $1 AND deleted_at IS NULL "
+        "AND requested_at >= $2 AND requested_at <= $3"
+    ),
+    "sel_exam_status_counts": (
+        "SELECT status, COUNT(*) AS count FROM public.medical_exams "
+        "WHERE organization_id = $1 AND deleted_at IS NULL "
+        "AND ($2::date IS NULL OR requested_at >= $2) "
+        "AND ($3::date IS NULL OR requested_at <= $3) "
+        "GROUP BY status"
+    ),
+    # Organizations ($1 names) with their patients among $2 names, for bulk exam creation;
+    # an organization without a matching patient comes back once with a NULL patient
+    "sel_exam_orgs_patients_by_names": (
+        "SELECT o.id AS organization_id, o.name AS organization_name, "
+        "p.id AS patient_id, p.name AS patient_name "
+        "FROM public.organizations o "
+        "LEFT JOIN public.patients p "
+        "ON p.organization_id = o.id AND p.name = ANY($2::text[]) AND p.deleted_at IS NULL "
+        "WHERE o.name = ANY($1::text[]) AND o.deleted_at IS NULL"
+    ),
+    "sel_exams_without_patient": (
+        f"SELECT {EXAM_LIST_COLUMNS} FROM public.medical_exams "
+        "WHERE organization_id = $1 AND patient_id IS NULL AND deleted_at IS NULL "
+        "ORDER BY requested_at DESC, created_at DESC"
+    ),
+    "sel_exam_patient_name": (
+        "SELECT p.name FROM public.medical_exams e "
+        "LEFT JOIN public.patients p ON e.patient_id = p.id AND p.deleted_at IS NULL "
+        "WHERE e.id = $1 AND e.deleted_at IS NULL"
+    ),
+}
+
+
+# PREPARE/EXECUTE text for each statement, built once at import
+_PREPARE_SQL = {name: f"PREPARE {name} AS {text}" for name, text in PREPARED_STATEMENTS.items()}
+# Plain-text form of each statement (positional $n -> named %(pn)s) for when PREPARE is disabled
+_PLAIN_SQL = {
+    name: re.sub(r"\$(\d+)", r"%(p\1)s", text) for name, text in PREPARED_STATEMENTS.items()
+}
+_EXECUTE_SQL = {
+    name: "EXECUTE {} ({})".format(
+        name, ", ".join(["%s"] * max(int(n) for n in re.findall(r"\$(\d+)", text)))
+    )
+    for name, text in PREPARED_STATEMENTS.items()
+}
+
+# List-returning methods hand back the RealDictRow objects as they come from the
+# cursor: they are dict subclasses, so copying them into plain dicts buys nothing.
 class Database:
-    def __init__(self):
-        self.connection_string = config.DATABASE_URL
+    def __init__(self, connection_string: Optional[str] = None,
+                 pool_min: Optional[int] = None, pool_max: Optional[int] = None):
+        self.connection_string = connection_string or config.DATABASE_URL
+        # Size pools so that processes x pool_max stays under the server's max_connections,
+        # or put PgBouncer in front when running many workers.
+        self.pool_min = config.DB_POOL_MIN if pool_min is None else pool_min
+        self.pool_max = config.DB_POOL_MAX if pool_max is None else pool_max
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._pool_lock = threading.Lock()
+        # connection -> names already PREPAREd on it; entries vanish with the connection
+        self._prepared = weakref.WeakKeyDictionary()
+        self._prepared_lock = threading.Lock()
+        # connection -> monotonic time it was last returned to the pool
+        self._last_used = weakref.WeakKeyDictionary()
+        # (lookup kind, organization name) -> id; only found organizations are cached
+        self._org_id_cache = TTLCache(maxsize=4096, ttl=300)
+        self._org_cache_lock = threading.RLock()
+        # cache key -> lock held by the thread currently querying it (single-flight)
+        self._org_inflight: Dict[Tuple[str, str], threading.Lock] = {}
+        # cache key -> lookup task shared by the coroutines waiting on it (event loop side)
+        self._org_lookups: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        """Lazily creates the connection pool on first use"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(
+                        self.pool_min,
+                        self.pool_max,
+                        dsn=self.connection_string,
+                        cursor_factory=RealDictCursor,
+                        # Pin search_path and the timeouts at connect time rather than per checkout
+                        options=(
+                            "-c search_path=public "
+                            f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS} "
+                            f"-c idle_in_transaction_session_timeout={config.DB_IDLE_IN_TRANSACTION_TIMEOUT_MS} "
+                            f"-c lock_timeout={config.DB_LOCK_TIMEOUT_MS}"
+                        ),
+                        # Detect connections dropped by NAT/firewalls instead of hanging on them
+                        keepalives=1,
+                        keepalives_idle=30,
+                        keepalives_interval=10,
+                        keepalives_count=3
+                    )
+        return self._pool
+
+    def close(self):
+        """Closes every pooled connection"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+    
+    def _checkout(self, pool: ThreadedConnectionPool):
+        """Gets a connection from the pool, replacing it if it turns out to be dead"""
+        conn = pool.getconn()
+        last_used = self._last_used.get(conn)
+        if conn.closed or (last_used is not None and time.monotonic() - last_used > PRE_PING_IDLE_SECONDS):
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+        return conn
+    
+    def _checkin(self, pool: ThreadedConnectionPool, conn):
+        if conn.closed:
+            pool.putconn(conn, close=True)
+            return
+        self._last_used[conn] = time.monotonic()
+        pool.putconn(conn)
+    
+    @staticmethod
+    def _reset_after_error(conn):
+        """Rolls back a failed transaction; closes the connection if even that fails"""
+        if conn.closed:
+            return
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            conn.close()
+    
+    @staticmethod
+    def _restore_autocommit(conn):
+        if not conn.closed:
+            conn.autocommit = False
     
     @contextlib.contextmanager
-    def get_connection(self):
-        """Context manager to handle database connections"""
-        conn = psycopg2.connect(
-            self.connection_string,
-            cursor_factory=RealDictCursor
-        )
+    def get_connection(self, autocommit: bool = False):
+        """Context manager that checks a connection out of the pool and returns it afterwards
+        
+        With autocommit=True every statement commits on its own, so single-statement
+        work costs one round trip instead of BEGIN + statement + COMMIT/ROLLBACK.
+        """
+        pool = self._get_pool()
+        conn = self._checkout(pool)
+        if autocommit:
+            conn.autocommit = True
         try:
             yield conn
+        except BaseException:
+            self._reset_after_error(conn)
+            raise
         finally:
-            conn.close()
+            if autocommit:
+                self._restore_autocommit(conn)
+            self._checkin(pool, conn)
+    
+    @staticmethod
+    def set_local_statement_timeout(cursor, milliseconds: int):
+        """Overrides statement_timeout for the rest of the current transaction (0 disables it)"""
+        cursor.execute("SELECT set_config('statement_timeout', %s, true)", (str(milliseconds),))
+    
+    def execute_prepared(self, cursor, name: str, params: tuple):
+        """Executes a statement from PREPARED_STATEMENTS, preparing it on first use per connection"""
+        if not config.DB_PREPARED_STATEMENTS:
+            cursor.execute(_PLAIN_SQL[name], {f"p{i}": value for i, value in enumerate(params, start=1)})
+            return
+        conn = cursor.connection
+        with self._prepared_lock:
+            prepared = self._prepared.setdefault(conn, set())
+        if name not in prepared:
+            cursor.execute(_PREPARE_SQL[name])
+            prepared.add(name)
+        cursor.execute(_EXECUTE_SQL[name], params)
     
     def init_db(self):
-        """Initializes the users table with proper constraints"""
-        # Como as tabelas já existem, este método pode ser simplificado
-        # ou até removido se não for necessário criar tabelas
-        print("INFO: Database tables already exist, skipping table creation")
+        """Creates the indexes the service queries rely on (tables already exist)"""
+        logger.info("Database tables already exist, skipping table creation")
+        try:
+            with self.get_connection() as conn:
+                # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+                conn.autocommit = True
+                try:
+                    with conn.cursor() as cursor:
+                        # Index builds may legitimately outlast the per-query timeouts
+                        cursor.execute("SET statement_timeout = 0; SET lock_timeout = 0")
+                        try:
+                            for ddl in INDEX_DDL:
+                                try:
+                                    cursor.execute(ddl)
+                                except psycopg2.Error as e:
+                                    logger.warning("Could not create index: %s", e)
+                        finally:
+                            cursor.execute("RESET statement_timeout; RESET lock_timeout")
+                finally:
+                    conn.autocommit = False
+        except Exception as e:
+            logger.error("Error creating indexes: %s", e)
+    
+    @staticmethod
+    def _org_cache_key(organization_name: str, exact: bool) -> Tuple[str, str]:
+        # Case-insensitive lookups share one entry per normalized name
+        if exact:
+            return ('exact', organization_name)
+        return ('ci', organization_name.strip().lower())
+    
+    def invalidate_org_cache(self, organization_name: str) -> None:
+        """Drops a cached organization ID (call when an organization is renamed or deleted)"""
+        with self._org_cache_lock:
+            self._org_id_cache.pop(self._org_cache_key(organization_name, True), None)
+            self._org_id_cache.pop(self._org_cache_key(organization_name, False), None)
+    
+    def peek_organization_id(self, organization_name: str, exact: bool = False) -> Optional[str]:
+        """Returns the cached organization ID without querying (None on a miss)"""
+        with self._org_cache_lock:
+            return self._org_id_cache.get(self._org_cache_key(organization_name, exact))
+    
+    def _cached_organization_id(self, organization_name: str, exact: bool) -> Optional[str]:
+        """Resolves an organization ID through the TTL cache
+        
+        Concurrent misses for the same name wait for a single query instead of
+        each going to the database.
+        """
+        key = self._org_cache_key(organization_name, exact)
+        with self._org_cache_lock:
+            organization_id = self._org_id_cache.get(key)
+            if organization_id is not None:
+                return organization_id
+            inflight = self._org_inflight.setdefault(key, threading.Lock())
+        
+        with inflight:
+            with self._org_cache_lock:
+                organization_id = self._org_id_cache.get(key)
+            if organization_id is not None:
+                return organization_id
+            try:
+                with self.get_connection() as conn:
+                    with conn.cursor() as cursor:
+                        if exact:
+                            self.execute_prepared(cursor, "sel_org_id_by_name", (organization_name,))
+                        else:
+                            # Busca com TRIM e case-insensitive
+                            self.execute_prepared(cursor, "sel_org_by_name_ci", (organization_name,))
+                        result = cursor.fetchone()
+                
+                if not result:
+                    logger.debug("Organization %r not found", organization_name)
+                    return None
+                logger.debug("Organization found - ID: %s, Name: %r", result['id'], organization_name)
+                with self._org_cache_lock:
+                    self._org_id_cache[key] = result['id']
+                return result['id']
+            finally:
+                with self._org_cache_lock:
+                    if self._org_inflight.get(key) is inflight:
+                        del self._org_inflight[key]
     
     def organization_exists(self, organization_name: str) -> bool:
         """Checks if an organization exists by name (case-insensitive)"""
+        with self._org_cache_lock:
+            if self._org_cache_key(organization_name, False) in self._org_id_cache:
+                return True
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(
-                        "SELECT EXISTS (SELECT 1 FROM public.organizations WHERE LOWER(TRIM(name)) = LOWER(TRIM(%s))) AS exists",
-                        (organization_name,)
-                    )
+                    self.execute_prepared(cursor, "org_exists", (organization_name,))
                     result = cursor.fetchone()
                     return result['exists']
         except Exception as e:
-            print(f"Error checking organization: {e}")
+            logger.error("Error checking organization: %s", e)
             return False
     
     def get_organization_id(self, organization_name: str) -> Optional[str]:
-        """Gets the organization ID by name (case-insensitive with debug)"""
+        """Gets the organization ID by name (case-insensitive, cached)"""
+        try:
+            return self._cached_organization_id(organization_name, exact=False)
+        except Exception as e:
+            logger.error("Error fetching organization: %s", e)
+            return None
+    
+    def get_active_organization_id(self, organization_name: str) -> Optional[str]:
+        """Gets the ID of a non-deleted organization by exact name (cached)
+        
+        Raises on database errors so callers can tell them apart from a missing organization.
+        """
+        return self._cached_organization_id(organization_name, exact=True)
+    
+    async def get_active_organization_id_async(self, organization_name: str) -> Optional[str]:
+        """Awaitable get_active_organization_id
+        
+        Cache hits are answered on the loop. Concurrent misses for the same name await
+        one shared lookup instead of each tying up a worker thread.
+        """
+        organization_id = self.peek_organization_id(organization_name, exact=True)
+        if organization_id is not None:
+            return organization_id
+        key = self._org_cache_key(organization_name, True)
+        lookup = self._org_lookups.get(key)
+        if lookup is None:
+            lookup = asyncio.ensure_future(
+                asyncio.to_thread(self._cached_organization_id, organization_name, True)
+            )
+            self._org_lookups[key] = lookup
+            lookup.add_done_callback(lambda _: self._org_lookups.pop(key, None))
+        # A cancelled caller must not cancel the lookup the others are waiting on
+        return await asyncio.shield(lookup)
+    
+    def create_user(self, user_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Creates a new user in the database"""
         try:
-            print(f"DEBUG: Searching for organization: '{organization_name}'")
+            logger.debug("Creating user %r in organization %s", user_data.get('email'), user_data.get('organization_id'))
             
-            with self.get_connection() as conn:
+            # Single INSERT with a server-generated id: autocommit, one round trip
+            with self.get_connection(autocommit=True) as conn:
                 with conn.cursor() as cursor:
-                    # Busca com TRIM e case-insensitive
-                    cursor.execute(
-                        "SELECT id, name FROM public.organizations WHERE LOWER(TRIM(name)) = LOWER(TRIM(%s))",
-                        (organization_name,)
-                    )
+                    self.execute_prepared(cursor, "ins_user", (
+                        user_data['name'],
+                        user_data['email'],
+                        user_data['password'],
+                        user_data['role'],
+                        user_data['organization_id']
+                    ))
+                    
                     result = cursor.fetchone()
                     
                     if result:
-                        print(f"DEBUG: Organization found - ID: {result['id']}, Name: '{result['name']}'")
-                        return result['id']
+                        logger.debug("User created successfully: %s", result['id'])
+                        return dict(result)
                     else:
-                        # Listar todas as organizações para debug
-                        cursor.execute("SELECT id, name FROM public.organizations")
-                        all_orgs = cursor.fetchall()
-                        print(f"DEBUG: Available organizations: {[dict(org) for org in all_orgs]}")
+                        logger.debug("User creation failed - no result returned")
                         return None
-                        
+                    
+        except psycopg2.IntegrityError as e:
+            logger.error("Integrity error creating user (duplicate email?): %s", e)
+            return None
         except Exception as e:
-            print(f"Error fetching organization: {e}")
+            logger.error("Error creating user: %s", e)
             return None
     
-    def create_user(self, user_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Creates a new user in the database"""
+    def create_user_by_org_name(self, user_data: Dict[str, Any], organization_name: str) -> Optional[Dict[str, Any]]:
+        """Creates a user in the organization with the given name (case-insensitive) in one round trip
+        
+        Returns None when the organization does not exist.
+        """
         try:
-            print(f"DEBUG: Creating user with data: {user_data}")
-            
-            with self.get_connection() as conn:
+            with self.get_connection(autocommit=True) as conn:
                 with conn.cursor() as cursor:
-                    # Gera UUID manualmente
-                    user_id = str(uuid.uuid4())
-                    
                     cursor.execute('''
+                        WITH org AS (
+                            SELECT id FROM public.organizations 
+                            WHERE LOWER(TRIM(name)) = LOWER(TRIM(%s))
+                            LIMIT 1
+                        )
                         INSERT INTO public.users (id, name, email, password, role, organization_id, created_at, updated_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                        RETURNING id, name, email, role, created_at, updated_at
+                        SELECT gen_random_uuid(), %s, %s, %s, %s, org.id, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP FROM org
+                        RETURNING id, name, email, role, organization_id, created_at, updated_at
                     ''', (
-                        user_id,
+                        organization_name,
                         user_data['name'],
                         user_data['email'],
                         user_data['password'],
-                        user_data['role'],
-                        user_data['organization_id']
+                        user_data['role']
                     ))
                     
                     result = cursor.fetchone()
-                    conn.commit()
                     
-                    if result:
-                        print(f"DEBUG: User created successfully: {dict(result)}")
-                        return dict(result)
-                    else:
-                        print("DEBUG: User creation failed - no result returned")
+                    if not result:
+                        logger.debug("Organization %r not found, user not created", organization_name)
                         return None
+                    return dict(result)
+                    
+        except psycopg2.IntegrityError as e:
+            logger.error("Integrity error creating user (duplicate email?): %s", e)
+            return None
+        except Exception as e:
+            logger.error("Error creating user: %s", e)
+            return None
+    
+    def bulk_create_users(self, users: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Creates many users with one INSERT per 1000 rows and a single commit"""
+        if not users:
+            return []
+        try:
+            rows = [
+                (u['name'], u['email'], u['password'], u['role'], u['organization_id'])
+                for u in users
+            ]
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    results = execute_values(
+                        cursor,
+                        '''
+                            INSERT INTO public.users (id, name, email, password, role, organization_id, created_at, updated_at)
+                            VALUES %s
+                            RETURNING id, name, email, role, created_at, updated_at
+                        ''',
+                        rows,
+                        template="(gen_random_uuid(), %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)",
+                        page_size=1000,
+                        fetch=True
+                    )
+                    conn.commit()
+                    return results
+                    
+        except psycopg2.IntegrityError as e:
+            logger.error("Integrity error creating users (duplicate email?): %s", e)
+            return None
+        except Exception as e:
+            logger.error("Error creating users: %s", e)
+            return None
+    
+    def copy_users(self, users: Iterable[Dict[str, Any]]) -> Optional[int]:
+        """Loads users with COPY FROM STDIN in one transaction; returns the number of rows copied
+        
+        Meant for seeds and migrations of thousands of rows. Use bulk_create_users for
+        small batches or when the created rows are needed back.
+        """
+        try:
+            now = datetime.now(timezone.utc).isoformat()
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for u in users:
+                writer.writerow((
+                    str(uuid.uuid4()), u['name'], u['email'], u['password'],
+                    u['role'], u['organization_id'], now, now
+                ))
+            buffer.seek(0)
+            
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Large loads can outlast the default per-query timeout
+                    self.set_local_statement_timeout(cursor, 0)
+                    cursor.copy_expert(
+                        "COPY public.users (id, name, email, password, role, organization_id, created_at, updated_at) "
+                        "FROM STDIN WITH (FORMAT csv)",
+                        buffer
+                    )
+                    copied = cursor.rowcount
+                    conn.commit()
+                    return copied
                     
         except psycopg2.IntegrityError as e:
-            print(f"Integrity error creating user (duplicate email?): {e}")
+            logger.error("Integrity error copying users (duplicate email?): %s", e)
             return None
         except Exception as e:
-            print(f"Error creating user: {e}")
+            logger.error("Error copying users: %s", e)
             return None
     
     def get_user_by_email_and_org(self, email: str, organization_id: str) -> Optional[Dict[str, Any]]:
@@ -116,17 +1126,13 @@ class Database:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute('''
-                        SELECT id, name, email, password, role, organization_id, created_at
-                        FROM public.users 
-                        WHERE email = %s AND organization_id = %s AND deleted_at IS NULL
-                    ''', (email, organization_id))
+                    self.execute_prepared(cursor, "sel_user_by_email_and_org", (email, organization_id))
                     
                     result = cursor.fetchone()
                     return dict(result) if result else None
                     
         except Exception as e:
-            print(f"Error fetching user: {e}")
+            logger.error("Error fetching user: %s", e)
             return None
     
     def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
@@ -134,74 +1140,276 @@ class Database:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute('''
-                        SELECT id, name, email, password, role, organization_id, created_at
-                        FROM public.users WHERE id = %s AND deleted_at IS NULL
-                    ''', (user_id,))
+                    self.execute_prepared(cursor, "sel_user_by_id", (user_id,))
                     
                     result = cursor.fetchone()
                     return dict(result) if result else None
                     
         except Exception as e:
-            print(f"Error fetching user by ID: {e}")
+            logger.error("Error fetching user by ID: %s", e)
             return None
     
-    def get_organization_users(self, organization_id: str) -> Optional[List[Dict[str, Any]]]:
-        """Lists all users of an organization"""
+    def get_users_by_ids(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Finds many users by ID in one query; returns them keyed by ID (missing IDs are absent)"""
+        user_ids = [str(user_id) for user_id in user_ids]
+        if not user_ids:
+            return {}
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute('''
-                        SELECT id, name, email, role, created_at
+                        SELECT id, name, email, role, organization_id, created_at
                         FROM public.users 
-                        WHERE organization_id = %s AND deleted_at IS NULL
-                        ORDER BY created_at DESC
-                    ''', (organization_id,))
+                        WHERE id = ANY(%s::uuid[]) AND deleted_at IS NULL
+                    ''', (user_ids,))
                     
-                    results = cursor.fetchall()
-                    return [dict(result) for result in results]
+                    return {str(result['id']): result for result in cursor.fetchall()}
+                    
+        except Exception as e:
+            logger.error("Error fetching users by IDs: %s", e)
+            return {}
+    
+    def _iter_rows(self, query: str, params: tuple, itersize: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Streams rows through a server-side cursor, holding at most itersize rows in memory"""
+        with self.get_connection() as conn:
+            with conn.cursor(name=f"srv_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield row
+            conn.commit()
+    
+    def iter_organization_users(self, organization_id: str) -> Iterator[Dict[str, Any]]:
+        """Streams the users of an organization without materializing the whole list"""
+        return self._iter_rows('''
+            SELECT id, name, email, role, created_at
+            FROM public.users 
+            WHERE organization_id = %s AND deleted_at IS NULL
+            ORDER BY created_at DESC
+        ''', (organization_id,))
+    
+    def get_organization_users(self, organization_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Lists all users of an organization"""
+        try:
+            return list(self.iter_organization_users(organization_id))
         except Exception as e:
-            print(f"Error fetching organization users: {e}")
+            logger.error("Error fetching organization users: %s", e)
             return None
 
-    @contextlib.asynccontextmanager
-    async def get_async_connection(self):
-        loop = asyncio.get_event_loop()
-        conn = await loop.run_in_executor(
-            None,
-            lambda: psycopg2.connect(
-                self.connection_string,
-                cursor_factory=RealDictCursor
-            )
+    @staticmethod
+    def _exam_scheduling_row(exam_data: Dict[str, Any]) -> tuple:
+        return (
+            str(uuid.uuid4()),
+            exam_data['organization_id'],
+            exam_data.get('patient_id'),
+            exam_data['exam_name'],
+            exam_data.get('exam_description'),
+            exam_data['scheduled_date'],
+            exam_data.get('scheduled_end_date'),
+            exam_data.get('exam_duration_minutes'),
+            exam_data.get('status') or 'scheduled',
+            exam_data.get('max_participants'),
+            exam_data.get('location'),
+            exam_data.get('instructions')
         )
+    
+    def create_exam_scheduling(self, exam_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Creates a new exam scheduling"""
+        results = self.bulk_create_exam_scheduling([exam_data])
+        return results[0] if results else None
+    
+    def bulk_create_exam_scheduling(self, exams: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Creates many exam schedulings with one INSERT per 1000 rows and a single commit"""
+        if not exams:
+            return []
         try:
-            yield conn
-        finally:
-            await loop.run_in_executor(None, conn.close)
+            rows = [self._exam_scheduling_row(exam_data) for exam_data in exams]
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    results = execute_values(
+                        cursor,
+                        f'''
+                            INSERT INTO public.exam_scheduling (
+                                id, organization_id, patient_id, exam_name, exam_description,
+                                scheduled_date, scheduled_end_date, exam_duration_minutes, status,
+                                max_participants, location, instructions, created_at, updated_at
+                            )
+                            VALUES %s
+                            RETURNING {EXAM_SCHEDULING_COLUMNS}
+                        ''',
+                        rows,
+                        template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)",
+                        page_size=1000,
+                        fetch=True
+                    )
+                    conn.commit()
+                    return results
+                    
+        except Exception as e:
+            logger.error("Error creating exam scheduling: %s", e)
+            return None
+
+    def get_exam_by_secure_identifier(self, exam_name: str, organization_id: str) -> Optional[Dict[str, Any]]:
+        """Finds an active exam scheduling by exam name within an organization"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    self.execute_prepared(cursor, "sel_exam_by_secure_identifier", (exam_name, organization_id))
+                    result = cursor.fetchone()
+                    return dict(result) if result else None
+        except Exception as e:
+            logger.error("Error fetching exam scheduling: %s", e)
+            return None
+    
+    def update_exam_scheduling(self, exam_name: str, organization_id: str,
+                               update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Updates the allowed fields of an active exam scheduling
+        
+        Raises ValueError for fields outside EXAM_SCHEDULING_UPDATABLE_FIELDS.
+        None values leave the column unchanged.
+        """
+        unknown = set(update_data) - set(EXAM_SCHEDULING_UPDATABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Fields cannot be updated: {', '.join(sorted(unknown))}")
+        try:
+            params = tuple(update_data.get(field) for field in EXAM_SCHEDULING_UPDATABLE_FIELDS)
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    self.execute_prepared(cursor, "upd_exam_scheduling", params + (exam_name, organization_id))
+                    result = cursor.fetchone()
+                    conn.commit()
+                    return dict(result) if result else None
+        except Exception as e:
+            logger.error("Error updating exam scheduling: %s", e)
+            return None
+    
+    def list_exams_by_organization(self, organization_id: str, after_date: Optional[datetime] = None,
+                                   after_id: Optional[uuid.UUID] = None, page_size: int = 10,
+                                   status: Optional[str] = None, page: int = 1) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Lists active exam schedulings of an organization ordered by scheduled date
+        
+        Keyset pagination: pass the returned cursor's after_date/after_id to get the
+        next page. The cursor is None on the last page. Without a cursor the page
+        is read by OFFSET from page.
+        """
+        try:
+            has_cursor = after_date is not None and after_id is not None
+            params: List[Any] = [organization_id]
+            if status:
+                params.append(status)
+            if has_cursor:
+                params.extend([after_date, after_id])
+            params.append(page_size)
+            if not has_cursor:
+                params.append((page - 1) * page_size)
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(_LIST_EXAMS_SQL[(bool(status), has_cursor)], params)
+                    results = cursor.fetchall()
             
-    async def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
-        async with self.get_async_connection() as conn:
-            cursor = conn.cursor()
+            next_cursor = None
+            if len(results) == page_size:
+                last = results[-1]
+                next_cursor = {"after_date": last['scheduled_date'], "after_id": str(last['id'])}
+            return results, next_cursor
+        except Exception as e:
+            logger.error("Error listing exam schedulings: %s", e)
+            return [], None
+    
+    def get_upcoming_exams(self, organization_id: str, hours_ahead: int = 24) -> List[Dict[str, Any]]:
+        """Lists scheduled exams starting within the next hours_ahead hours"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(_UPCOMING_EXAMS_SQL, (organization_id, hours_ahead))
+                    return cursor.fetchall()
+        except Exception as e:
+            logger.error("Error fetching upcoming exams: %s", e)
+            return []
+
+    def delete_exam_scheduling(self, exam_name: str, organization_id: str) -> bool:
+        """Soft-deletes an active exam scheduling"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        UPDATE public.exam_scheduling
+                        SET deleted_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                        WHERE exam_name = %s AND organization_id = %s AND deleted_at IS NULL
+                    ''', (exam_name, organization_id))
+                    deleted = cursor.rowcount > 0
+                    conn.commit()
+                    return deleted
+        except Exception as e:
+            logger.error("Error deleting exam scheduling: %s", e)
+            return False
+    
+    def get_exam_statistics(self, organization_id: str) -> Optional[Dict[str, Any]]:
+        """Counts an organization's active exam schedulings per status, aggregated into one row"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        SELECT COALESCE(SUM(count), 0)::int AS total_exams,
+                               COALESCE(SUM(upcoming), 0)::int AS upcoming_exams,
+                               COALESCE(json_object_agg(status, count) FILTER (WHERE status IS NOT NULL), '{}') AS by_status
+                        FROM (
+                            SELECT status,
+                                   COUNT(*) AS count,
+                                   COUNT(*) FILTER (WHERE scheduled_date >= NOW()) AS upcoming
+                            FROM public.exam_scheduling
+                            WHERE organization_id = %s AND deleted_at IS NULL
+                            GROUP BY status
+                        ) s
+                    ''', (organization_id,))
+                    result = cursor.fetchone()
+                    return dict(result) if result else None
+        except Exception as e:
+            logger.error("Error fetching exam statistics: %s", e)
+            return None
+
+    # The async helpers run the whole checkout/execute/fetch cycle in a worker
+    # thread, so the event loop never waits on the socket. `query` may also be
+    # the name of a PREPARED_STATEMENTS entry, which is then EXECUTEd.
+    def _execute(self, cursor, query: str, params: tuple = None):
+        if query in PREPARED_STATEMENTS:
+            self.execute_prepared(cursor, query, tuple(params or ()))
+        else:
             cursor.execute(query, params or ())
-            results = cursor.fetchall()
-            conn.commit()
-            return [dict(row) for row in results] if results else []
+    
+    # Each helper runs exactly one statement, so autocommit gives the same atomicity
+    # without the BEGIN and COMMIT round trips.
+    def _execute_query_sync(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
+        with self.get_connection(autocommit=True) as conn:
+            with conn.cursor() as cursor:
+                self._execute(cursor, query, params)
+                return cursor.fetchall()
+    
+    def _execute_update_sync(self, query: str, params: tuple = None) -> bool:
+        with self.get_connection(autocommit=True) as conn:
+            with conn.cursor() as cursor:
+                self._execute(cursor, query, params)
+                return cursor.rowcount > 0
+    
+    def _fetch_one_sync(self, query: str, params: tuple = None) -> Optional[Dict[str, Any]]:
+        with self.get_connection(autocommit=True) as conn:
+            with conn.cursor() as cursor:
+                self._execute(cursor, query, params)
+                result = cursor.fetchone()
+                return dict(result) if result else None
+    
+    async def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._execute_query_sync, query, params)
         
     async def execute_update(self, query: str, params: tuple = None) -> bool:
-        async with self.get_async_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params or ())
-            conn.commit()
-            return cursor.rowcount > 0
+        return await asyncio.to_thread(self._execute_update_sync, query, params)
         
     async def fetch_one(self, query: str, params: tuple = None) -> Optional[Dict[str, Any]]:
-        async with self.get_async_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params or ())
-            result = cursor.fetchone()
-            return dict(result) if result else None
+        return await asyncio.to_thread(self._fetch_one_sync, query, params)
     
 
 
-# Global database instance
-db = Database()
\ No newline at end of file
+# Global database instances
+db = Database()
+db_primary = db
+db_secondary = Database(config.DATABASE_URL_SECONDARY, config.DBX_POOL_MIN, config.DBX_POOL_MAX)
\ No newline at end of file
@@ -1,37 +1,186 @@
+import asyncio
 import logging
 from uuid import UUID
 from datetime import datetime, date
 from typing import List, Optional, Dict, Any, Tuple
-from app.database import db
+from cachetools import TTLCache
+from psycopg2.extras import execute_values
+from app.config import config
+from app.database import (
+    db, audit_by_organization_statement, audit_by_organization_count_statement, JsonParam
+)
 
 logger = logging.getLogger(__name__)
 
-class ExamAnalysisAuditService:
+# One audit row as inserted by log_bulk:
+# (exam_analyses_id, action_type, old_data, new_data, changed_fields, application_name)
+# changed_fields travels as a text[][] literal, see _changed_fields_literal
+AuditRow = Tuple[str, str, Optional[JsonParam], Optional[JsonParam], Optional[str], Optional[str]]
+
+
+def _quote_array_element(value: Any) -> str:
+    text = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{text}"'
+
+
+def _changed_fields_literal(changed_fields: List[Tuple[Any, Any, Any]]) -> str:
+    # One array literal parsed by array_in instead of an ARRAY[ARRAY[...]] expression
+    # with a quoted constant per field/old/new value
+    return "{" + ",".join(
+        "{" + ",".join(_quote_array_element(item) for item in entry) + "}"
+        for entry in changed_fields
+    ) + "}"
+
+
+# Rows per INSERT statement when flushing audit entries
+AUDIT_INSERT_PAGE_SIZE = 500
+
+
+def _insert_audit_rows(rows: List[AuditRow]) -> int:
     
-    async def _get_organization_id_by_name(self, organization_name: str) -> Optional[UUID]:
-        
-        logger.debug(f"Resolving organization ID for name: {organization_name}")
-        async with db.get_async_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT id FROM public.organizations WHERE name = %s AND deleted_at IS NULL",
-                (organization_name,)
-            )
-            org = cursor.fetchone()
-            if not org:
-                return None
-            return UUID(org['id'])
+    # A flush that fits in one INSERT runs in autocommit: one round trip, no BEGIN/COMMIT.
+    # With AUDIT_ASYNC_COMMIT the flush is a transaction that does not wait for the WAL
+    # flush; a crash may then lose the last few hundred ms of audit rows.
+    async_commit = config.AUDIT_ASYNC_COMMIT
+    single_statement = len(rows) <= AUDIT_INSERT_PAGE_SIZE and not async_commit
+    with db.get_connection(autocommit=single_statement) as conn:
+        with conn.cursor() as cursor:
+            if async_commit:
+                cursor.execute("SET LOCAL synchronous_commit = off")
+            if len(rows) == 1:
+                db.execute_prepared(cursor, "ins_audit_row", rows[0])
+            else:
+                execute_values(
+                    cursor,
+                    """
+                        INSERT INTO public.exam_analyses_audit (
+                            exam_analyses_id,
+                            action_type,
+                            old_data,
+                            new_data,
+                            changed_fields,
+                            application_name
+                        ) VALUES %s
+                    """,
+                    rows,
+                    template="(%s, %s, %s, %s, %s::text[], %s)",
+                    page_size=AUDIT_INSERT_PAGE_SIZE
+                )
+        if not single_statement:
+            conn.commit()
+    return len(rows)
+
+
+def _insert_audit_rows_each(rows: List[AuditRow]) -> List[Optional[Exception]]:
+    # Inserts the rows one at a time, returning the error (or None) for each, so a bad
+    # row in a failed batch only fails its own caller
+    errors: List[Optional[Exception]] = []
+    for row in rows:
+        try:
+            _insert_audit_rows([row])
+        except Exception as e:
+            errors.append(e)
+        else:
+            errors.append(None)
+    return errors
+
+
+class _AuditBatcher:
+    # Group commit: concurrent log_* calls are queued and flushed together in one
+    # INSERT and one transaction. Each caller still waits until its row is committed.
+
+    def __init__(self, max_batch: int = AUDIT_INSERT_PAGE_SIZE, max_delay: float = 0.005):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, row: AuditRow) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        future = loop.create_future()
+        await self._queue.put((row, future))
+        await future
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            rows = [row for row, _ in batch]
+            try:
+                await asyncio.to_thread(_insert_audit_rows, rows)
+                errors: List[Optional[Exception]] = [None] * len(batch)
+            except Exception as e:
+                # Nothing of the batch was committed; retry row by row so only the
+                # callers whose own row fails see an error
+                if len(batch) == 1:
+                    errors = [e]
+                else:
+                    try:
+                        errors = await asyncio.to_thread(_insert_audit_rows_each, rows)
+                    except Exception as retry_error:
+                        errors = [retry_error] * len(batch)
+            for (_, future), error in zip(batch, errors):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+
+_audit_batcher = _AuditBatcher()
+
+
+# Exact totals of the paginated listings keyed by their filters, so paging through
+# a listing counts the matching rows once instead of on every page
+_audit_count_cache = TTLCache(maxsize=1024, ttl=30)
+
+
+def _page_total(audits: List[Dict[str, Any]], count_key: Tuple) -> Optional[int]:
+    # Reads and strips the listing total from a page, remembering it for count_key;
+    # None when the page is empty and has no row to read it from
+    if not audits:
+        return None
+    total_count = audits[0]["total_count"]
+    for audit in audits:
+        del audit["total_count"]
+    _audit_count_cache[count_key] = total_count
+    return total_count
+
+
+async def _count_total(count_key: Tuple, statement: str, params: List[Any]) -> int:
+    # Counts a listing whose page came back empty, remembering the total for count_key
+    total_count = (await db.fetch_one(statement, params))["total"]
+    _audit_count_cache[count_key] = total_count
+    return total_count
+
+
+def _next_cursor(audits: List[Dict[str, Any]], page_size: int) -> Optional[Dict[str, Any]]:
+    # Keyset cursor for the page after `audits`; None once a short page is returned
+    if len(audits) < page_size:
+        return None
+    last = audits[-1]
+    return {"after_changed_at": last["changed_at"], "after_id": str(last["id"])}
+
 
+class ExamAnalysisAuditService:
+    
     async def _get_analysis_organization_id(self, analysis_id: UUID) -> Optional[UUID]:
         
-        async with db.get_async_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT organizations_id FROM public.exam_analyses WHERE id = %s",
-                (str(analysis_id),)
-            )
-            row = cursor.fetchone()
-            return UUID(row['organizations_id']) if row else None
+        row = await db.fetch_one("sel_analysis_org_id", (str(analysis_id),))
+        return UUID(row['organizations_id']) if row else None
 
     
     async def log_insert(
@@ -43,20 +192,11 @@ class ExamAnalysisAuditService:
         
         logger.info(f"Logging INSERT for exam analysis ID: {analysis_id}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    INSERT INTO public.exam_analyses_audit (
-                        exam_analyses_id,
-                        action_type,
-                        new_data,
-                        application_name
-                    ) VALUES (%s, 'INSERT', %s::jsonb, %s)
-                """
-                cursor.execute(query, (str(analysis_id), new_data, application_name))
-                conn.commit()
-                logger.debug(f"INSERT audit logged for analysis {analysis_id}")
-                return True
+            await _audit_batcher.submit(
+                (str(analysis_id), 'INSERT', None, JsonParam(new_data), None, application_name)
+            )
+            logger.debug(f"INSERT audit logged for analysis {analysis_id}")
+            return True
         except Exception as e:
             logger.error(f"Error logging INSERT audit: {e}")
             raise Exception(f"Database error logging audit: {str(e)}")
@@ -72,36 +212,18 @@ class ExamAnalysisAuditService:
         
         logger.info(f"Logging UPDATE for exam analysis ID: {analysis_id}")
         try:
-            
-            changed_fields_array = [
-                [str(field), str(old), str(new)] for field, old, new in changed_fields
-            ]
-
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    INSERT INTO public.exam_analyses_audit (
-                        exam_analyses_id,
-                        action_type,
-                        old_data,
-                        new_data,
-                        changed_fields,
-                        application_name
-                    ) VALUES (%s, 'UPDATE', %s::jsonb, %s::jsonb, %s, %s)
-                """
-                cursor.execute(
-                    query,
-                    (
-                        str(analysis_id),
-                        old_data,
-                        new_data,
-                        changed_fields_array,
-                        application_name
-                    )
+            await _audit_batcher.submit(
+                (
+                    str(analysis_id),
+                    'UPDATE',
+                    JsonParam(old_data),
+                    JsonParam(new_data),
+                    _changed_fields_literal(changed_fields),
+                    application_name
                 )
-                conn.commit()
-                logger.debug(f"UPDATE audit logged for analysis {analysis_id}")
-                return True
+            )
+            logger.debug(f"UPDATE audit logged for analysis {analysis_id}")
+            return True
         except Exception as e:
             logger.error(f"Error logging UPDATE audit: {e}")
             raise Exception(f"Database error logging audit: {str(e)}")
@@ -115,48 +237,74 @@ class ExamAnalysisAuditService:
         
         logger.info(f"Logging DELETE for exam analysis ID: {analysis_id}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    INSERT INTO public.exam_analyses_audit (
-                        exam_analyses_id,
-                        action_type,
-                        old_data,
-                        application_name
-                    ) VALUES (%s, 'DELETE', %s::jsonb, %s)
-                """
-                cursor.execute(query, (str(analysis_id), old_data, application_name))
-                conn.commit()
-                logger.debug(f"DELETE audit logged for analysis {analysis_id}")
-                return True
+            await _audit_batcher.submit(
+                (str(analysis_id), 'DELETE', JsonParam(old_data), None, None, application_name)
+            )
+            logger.debug(f"DELETE audit logged for analysis {analysis_id}")
+            return True
         except Exception as e:
             logger.error(f"Error logging DELETE audit: {e}")
             raise Exception(f"Database error logging audit: {str(e)}")
 
     
+    async def log_bulk(self, entries: List[Dict[str, Any]]) -> int:
+        
+        # entries: dicts with analysis_id, action_type and, as applicable, old_data,
+        # new_data, changed_fields [(campo, valor_antigo, valor_novo)] and application_name
+        logger.info(f"Logging {len(entries)} audit entries in bulk")
+        if not entries:
+            return 0
+        try:
+            rows = [
+                (
+                    str(entry['analysis_id']),
+                    entry['action_type'],
+                    JsonParam(entry['old_data']) if entry.get('old_data') is not None else None,
+                    JsonParam(entry['new_data']) if entry.get('new_data') is not None else None,
+                    _changed_fields_literal(entry['changed_fields'])
+                    if entry.get('changed_fields') else None,
+                    entry.get('application_name')
+                )
+                for entry in entries
+            ]
+            return await asyncio.to_thread(_insert_audit_rows, rows)
+        except Exception as e:
+            logger.error(f"Error logging bulk audit: {e}")
+            raise Exception(f"Database error logging audit: {str(e)}")
+
+    async def get_audit_detail(self, audit_id: UUID) -> Optional[Dict[str, Any]]:
+        
+        logger.info(f"Fetching audit detail for ID: {audit_id}")
+        try:
+            return await db.fetch_one("sel_audit_detail", (str(audit_id),))
+        except Exception as e:
+            logger.error(f"Error fetching audit detail: {e}")
+            raise Exception(f"Database error fetching audit: {str(e)}")
+
     async def get_audit_for_analysis(
         self,
         analysis_id: UUID,
         limit: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        after_changed_at: Optional[datetime] = None,
+        after_id: Optional[UUID] = None
     ) -> List[Dict[str, Any]]:
         
+        # With after_changed_at/after_id (taken from the last row of the previous page)
+        # the page is read by seeking the index instead of skipping `offset` rows
         logger.info(f"Fetching audit for analysis ID: {analysis_id}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT *
-                    FROM public.exam_analyses_audit
-                    WHERE exam_analyses_id = %s
-                    ORDER BY changed_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(query, (str(analysis_id), limit, offset))
-                rows = cursor.fetchall()
-                audits = [dict(row) for row in rows]
-                logger.info(f"Found {len(audits)} audit records for analysis {analysis_id}")
-                return audits
+            has_cursor = after_changed_at is not None and after_id is not None
+            params: List[Any] = [str(analysis_id)]
+            if has_cursor:
+                params.extend([after_changed_at, str(after_id), limit])
+            else:
+                params.extend([limit, offset])
+
+            statement = "sel_audit_for_analysis_after" if has_cursor else "sel_audit_for_analysis"
+            audits = await db.execute_query(statement, params)
+            logger.info(f"Found {len(audits)} audit records for analysis {analysis_id}")
+            return audits
         except Exception as e:
             logger.error(f"Error fetching audit for analysis: {e}")
             raise Exception(f"Database error fetching audit: {str(e)}")
@@ -168,67 +316,63 @@ class ExamAnalysisAuditService:
         end_date: Optional[datetime] = None,
         action_type: Optional[str] = None,
         page: int = 1,
-        page_size: int = 50
+        page_size: int = 50,
+        after_changed_at: Optional[datetime] = None,
+        after_id: Optional[UUID] = None
     ) -> Dict[str, Any]:
         
+        # Passing next_cursor's after_changed_at/after_id switches from OFFSET to keyset
+        # pagination. total_count is always the whole listing's, cached per filter for 30s.
         logger.info(f"Fetching audit for organization: {organization_name}")
 
         try:
-            org_id = await self._get_organization_id_by_name(organization_name)
-            if not org_id:
-                raise Exception(f"Organization '{organization_name}' not found")
-
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-
-                conditions = ["ea.organizations_id = %s"]
-                params = [str(org_id)]
-
-                if start_date:
-                    conditions.append("a.changed_at >= %s")
-                    params.append(start_date)
-                if end_date:
-                    conditions.append("a.changed_at <= %s")
-                    params.append(end_date)
-                if action_type:
-                    conditions.append("a.action_type = %s")
-                    params.append(action_type)
-
-                where_clause = " AND ".join(conditions)
-                
-                count_query = f"""
-                    SELECT COUNT(*) as total
-                    FROM public.exam_analyses_audit a
-                    JOIN public.exam_analyses ea ON a.exam_analyses_id = ea.id
-                    WHERE {where_clause}
-                """
-                cursor.execute(count_query, params)
-                total_count = cursor.fetchone()["total"]
-
-                
-                offset = (page - 1) * page_size
-                select_query = f"""
-                    SELECT a.*, ea.exam_type, ea.organizations_id
-                    FROM public.exam_analyses_audit a
-                    JOIN public.exam_analyses ea ON a.exam_analyses_id = ea.id
-                    WHERE {where_clause}
-                    ORDER BY a.changed_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(select_query, params + [page_size, offset])
-                rows = cursor.fetchall()
-
-                audits = [dict(row) for row in rows]
-                total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
-
-                logger.info(f"Found {len(audits)} audit records for organization {organization_name}")
-                return {
-                    "audits": audits,
-                    "total_count": total_count,
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": total_pages,
-                }
+            count_key = ("organization", organization_name.strip().lower(), start_date, end_date, action_type)
+            total_count = _audit_count_cache.get(count_key)
+
+            params: List[Any] = [organization_name]
+            if start_date:
+                params.append(start_date)
+            if end_date:
+                params.append(end_date)
+            if action_type:
+                params.append(action_type)
+
+            count_params = list(params)
+            offset = (page - 1) * page_size
+            has_cursor = after_changed_at is not None and after_id is not None
+            if has_cursor:
+                params.extend([after_changed_at, str(after_id), page_size])
+            else:
+                params.extend([page_size, offset])
+
+            statement = audit_by_organization_statement(
+                bool(start_date), bool(end_date), bool(action_type), has_cursor, total_count is None
+            )
+            audits = await db.execute_query(statement, params)
+            if total_count is None:
+                total_count = _page_total(audits, count_key)
+            if total_count is None:
+                # An empty page has no row to read the total from; past the end it is counted
+                total_count = 0
+                if offset > 0 or has_cursor:
+                    total_count = await _count_total(
+                        count_key,
+                        audit_by_organization_count_statement(
+                            bool(start_date), bool(end_date), bool(action_type)
+                        ),
+                        count_params,
+                    )
+            total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
+
+            logger.info(f"Found {len(audits)} audit records for organization {organization_name}")
+            return {
+                "audits": audits,
+                "total_count": total_count,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": total_pages,
+                "next_cursor": _next_cursor(audits, page_size),
+            }
 
         except Exception as e:
             logger.error(f"Error fetching audit by organization: {e}")
@@ -238,25 +382,24 @@ class ExamAnalysisAuditService:
         self,
         db_user: str,
         limit: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        after_changed_at: Optional[datetime] = None,
+        after_id: Optional[UUID] = None
     ) -> List[Dict[str, Any]]:
         
         logger.info(f"Fetching audit for DB user: {db_user}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT *
-                    FROM public.exam_analyses_audit
-                    WHERE db_user = %s
-                    ORDER BY changed_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(query, (db_user, limit, offset))
-                rows = cursor.fetchall()
-                audits = [dict(row) for row in rows]
-                logger.info(f"Found {len(audits)} audit records for user {db_user}")
-                return audits
+            has_cursor = after_changed_at is not None and after_id is not None
+            params: List[Any] = [db_user]
+            if has_cursor:
+                params.extend([after_changed_at, str(after_id), limit])
+            else:
+                params.extend([limit, offset])
+
+            statement = "sel_audit_by_user_after" if has_cursor else "sel_audit_by_user"
+            audits = await db.execute_query(statement, params)
+            logger.info(f"Found {len(audits)} audit records for user {db_user}")
+            return audits
         except Exception as e:
             logger.error(f"Error fetching audit by user: {e}")
             raise Exception(f"Database error fetching audit: {str(e)}")
@@ -266,46 +409,50 @@ class ExamAnalysisAuditService:
         start_date: datetime,
         end_date: datetime,
         page: int = 1,
-        page_size: int = 50
+        page_size: int = 50,
+        after_changed_at: Optional[datetime] = None,
+        after_id: Optional[UUID] = None
     ) -> Dict[str, Any]:
         
+        # Same cursor semantics as get_audit_by_organization
         logger.info(f"Fetching audit from {start_date} to {end_date}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                conditions = ["changed_at >= %s", "changed_at <= %s"]
-                params = [start_date, end_date]
-
-                count_query = f"""
-                    SELECT COUNT(*) as total
-                    FROM public.exam_analyses_audit
-                    WHERE {' AND '.join(conditions)}
-                """
-                cursor.execute(count_query, params)
-                total_count = cursor.fetchone()["total"]
-
-                offset = (page - 1) * page_size
-                select_query = f"""
-                    SELECT *
-                    FROM public.exam_analyses_audit
-                    WHERE {' AND '.join(conditions)}
-                    ORDER BY changed_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(select_query, params + [page_size, offset])
-                rows = cursor.fetchall()
-
-                audits = [dict(row) for row in rows]
-                total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
-
-                logger.info(f"Found {len(audits)} audit records in date range")
-                return {
-                    "audits": audits,
-                    "total_count": total_count,
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": total_pages,
-                }
+            count_key = ("date_range", start_date, end_date)
+            total_count = _audit_count_cache.get(count_key)
+
+            params: List[Any] = [start_date, end_date]
+            count_params = list(params)
+            offset = (page - 1) * page_size
+            has_cursor = after_changed_at is not None and after_id is not None
+            if has_cursor:
+                params.extend([after_changed_at, str(after_id), page_size])
+            else:
+                params.extend([page_size, offset])
+
+            statement = "sel_audit_by_date_range"
+            if has_cursor:
+                statement += "_after"
+            if total_count is None:
+                statement += "_counted"
+            audits = await db.execute_query(statement, params)
+            if total_count is None:
+                total_count = _page_total(audits, count_key)
+            if total_count is None:
+                # An empty page has no row to read the total from; past the end it is counted
+                total_count = 0
+                if offset > 0 or has_cursor:
+                    total_count = await _count_total(count_key, "cnt_audit_by_date_range", count_params)
+            total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
+
+            logger.info(f"Found {len(audits)} audit records in date range")
+            return {
+                "audits": audits,
+                "total_count": total_count,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": total_pages,
+                "next_cursor": _next_cursor(audits, page_size),
+            }
         except Exception as e:
             logger.error(f"Error fetching audit by date range: {e}")
             raise Exception(f"Database error fetching audit: {str(e)}")
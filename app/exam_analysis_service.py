@@ -1,28 +1,82 @@
 import logging
 from uuid import UUID
 from datetime import date, datetime
-from typing import List, Optional, Dict, Any
-from app.database import db
+from typing import List, Optional, Dict, Any, Tuple
+import psycopg2
+from cachetools import TTLCache
+from app.database import db, analysis_page_statement, JsonParam
 
 logger = logging.getLogger(__name__)
 
 
-class ExamAnalysisService:
-    
-    async def _get_organization_id_by_name(self, organization_name: str) -> Optional[UUID]:
-        
-        logger.debug(f"Resolving organization ID for name: {organization_name}")
-        async with db.get_async_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT id FROM public.organizations WHERE name = %s AND deleted_at IS NULL",
-                (organization_name,)
-            )
-            org = cursor.fetchone()
-            if not org:
-                return None
-            return UUID(org['id'])
+class DatabaseError(RuntimeError):
+    """A driver error raised while running an exam analysis query; the psycopg2 error is its __cause__"""
+
+
+# Exact totals of the organization listings keyed by their filters, so paging through
+# a listing counts the matching rows once instead of on every page
+_analysis_count_cache = TTLCache(maxsize=1024, ttl=30)
+
+
+def _page_items(rows: List[Dict[str, Any]], count_key: Tuple,
+                total_count: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
+    # Drops the all-NULL row of an empty page and reads (then strips) the listing total
+    # when the page carries one, remembering it for count_key. Every row of a counted
+    # page has the total, the empty-page row included. The pool's RealDictCursor rows are
+    # dicts already, so they are returned as fetched rather than copied.
+    if total_count is None:
+        total_count = rows[0]["total_count"]
+        for row in rows:
+            del row["total_count"]
+        _analysis_count_cache[count_key] = total_count
+    items = [row for row in rows if row["id"] is not None]
+    return items, total_count
+
+
+# Statistics and first pages, which dashboards re-request for the same filters. An entry
+# is (organization id, write generation, result); a write to an organization bumps its
+# generation, so its entries stop matching without scanning the cache.
+_response_cache = TTLCache(maxsize=4096, ttl=30)
+_write_generations: Dict[str, int] = {}
+_write_sequence = 0
+
+
+def _cached_response(key: Tuple) -> Optional[Dict[str, Any]]:
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    organization_id, generation, result = entry
+    return result if _write_generations.get(organization_id, 0) == generation else None
+
+
+def _cache_response(key: Tuple, organization_id: Any, sequence: int, result: Dict[str, Any]) -> None:
+    # `sequence` is _write_sequence from before the read; a write that ran meanwhile
+    # may or may not be in `result`, so it is not cached
+    if sequence == _write_sequence:
+        organization_id = str(organization_id)
+        _response_cache[key] = (organization_id, _write_generations.get(organization_id, 0), result)
+
+
+def _invalidate_responses(organization_id: Any) -> None:
+    global _write_sequence
+    organization_id = str(organization_id)
+    _write_generations[organization_id] = _write_generations.get(organization_id, 0) + 1
+    _write_sequence += 1
 
+
+def _next_cursor(items: List[Dict[str, Any]], page_size: int) -> Optional[Dict[str, Any]]:
+    # Keyset cursor for the page after `items`; None once a short page is returned
+    if len(items) < page_size:
+        return None
+    last = items[-1]
+    return {
+        "after_exam_date": last["exam_date"],
+        "after_created_at": last["created_at"],
+        "after_id": str(last["id"]),
+    }
+
+
+class ExamAnalysisService:
     
     async def create_exam_analysis(
         self,
@@ -34,7 +88,7 @@ class ExamAnalysisService:
         observations: Optional[Dict[str, Any]] = None,
     ) -> Optional[Dict[str, Any]]:
         
-        logger.info(f"Creating exam analysis for organization: {organization_name}")
+        logger.debug("Creating exam analysis for organization: %s", organization_name)
         
         if not exam_type or not exam_type.strip():
             raise Exception("Exam type cannot be empty")
@@ -42,75 +96,50 @@ class ExamAnalysisService:
             raise Exception("Original results cannot be empty")
 
         try:
-            
-            organization_id = await self._get_organization_id_by_name(organization_name)
-            if not organization_id:
-                raise Exception(f"Organization '{organization_name}' not found or is deleted")
-
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-
-                insert_query = """
-                    INSERT INTO public.exam_analyses (
-                        organizations_id,
-                        exam_type,
-                        exam_date,
-                        original_results,
-                        exam_result,
-                        observations,
-                        analysis_date,
-                        created_at,
-                        updated_at
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
-                    )
-                    RETURNING *
-                """
-                cursor.execute(
-                    insert_query,
-                    (
-                        str(organization_id),
-                        exam_type.strip(),
-                        exam_date or datetime.utcnow(),
-                        original_results,      # psycopg2 automatically converts dict/list to JSONB
-                        exam_result,
-                        observations,
-                    )
+            # The organization is resolved inside the INSERT ... SELECT; no row back means
+            # it does not exist
+            created = await db.fetch_one(
+                "ins_exam_analysis",
+                (
+                    organization_name,
+                    exam_type.strip(),
+                    exam_date or datetime.utcnow(),
+                    # JsonParam adapts dicts and lists to jsonb input (a bare list would become an ARRAY)
+                    JsonParam(original_results),
+                    JsonParam(exam_result) if exam_result is not None else None,
+                    JsonParam(observations) if observations is not None else None,
                 )
+            )
 
-                created = cursor.fetchone()
-                conn.commit()
-
-                if not created:
-                    raise Exception("Failed to create exam analysis")
+            if not created:
+                raise Exception(f"Organization '{organization_name}' not found or is deleted")
+            _invalidate_responses(created["organizations_id"])
+            created.update(
+                original_results=original_results,
+                exam_result=exam_result,
+                observations=observations,
+            )
 
-                logger.info(f"Exam analysis created successfully with ID: {created['id']}")
-                return dict(created)
+            logger.debug("Exam analysis created successfully with ID: %s", created['id'])
+            return created
 
-        except Exception as e:
-            logger.error(f"Error creating exam analysis: {e}")
-            raise Exception(f"Database error creating exam analysis: {str(e)}")
+        except psycopg2.Error as e:
+            logger.error("Error creating exam analysis: %s", e)
+            raise DatabaseError(f"Database error creating exam analysis: {e}") from e
 
     
     async def get_exam_analysis_by_id(self, analysis_id: UUID) -> Optional[Dict[str, Any]]:
         
-        logger.info(f"Fetching exam analysis by ID: {analysis_id}")
+        logger.debug("Fetching exam analysis by ID: %s", analysis_id)
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT * FROM public.exam_analyses
-                    WHERE id = %s
-                """
-                cursor.execute(query, (str(analysis_id),))
-                row = cursor.fetchone()
-                if not row:
-                    logger.warning(f"Exam analysis not found with ID: {analysis_id}")
-                    return None
-                return dict(row)
-        except Exception as e:
-            logger.error(f"Error fetching exam analysis: {e}")
-            raise Exception(f"Database error fetching exam analysis: {str(e)}")
+            row = await db.fetch_one("sel_exam_analysis", (analysis_id,))
+            if not row:
+                logger.warning("Exam analysis not found with ID: %s", analysis_id)
+                return None
+            return row
+        except psycopg2.Error as e:
+            logger.error("Error fetching exam analysis: %s", e)
+            raise DatabaseError(f"Database error fetching exam analysis: {e}") from e
 
     
     async def update_exam_analysis(
@@ -123,87 +152,116 @@ class ExamAnalysisService:
         observations: Optional[Dict[str, Any]] = None,
     ) -> Optional[Dict[str, Any]]:
         
-        logger.info(f"Updating exam analysis with ID: {analysis_id}")
+        logger.debug("Updating exam analysis with ID: %s", analysis_id)
         
         if exam_type is not None and not exam_type.strip():
             raise Exception("Exam type cannot be empty")
 
+        if all(value is None for value in (exam_type, exam_date, original_results, exam_result, observations)):
+            # Nothing to change: the current row (or None when it does not exist)
+            return await self.get_exam_analysis_by_id(analysis_id)
+
         try:
-            
-            existing = await self.get_exam_analysis_by_id(analysis_id)
-            if not existing:
+            # One prepared UPDATE for every change set: absent fields are bound as NULL and
+            # keep their value. No existence check first: a missing ID returns no row.
+            updated = await db.fetch_one(
+                "upd_exam_analysis",
+                (
+                    exam_type.strip() if exam_type is not None else None,
+                    exam_date,
+                    JsonParam(original_results) if original_results is not None else None,
+                    JsonParam(exam_result) if exam_result is not None else None,
+                    JsonParam(observations) if observations is not None else None,
+                    analysis_id,
+                )
+            )
+
+            if not updated:
+                logger.warning("Exam analysis not found: %s", analysis_id)
                 return None
+            _invalidate_responses(updated["organizations_id"])
+            for field, value in (("original_results", original_results),
+                                 ("exam_result", exam_result),
+                                 ("observations", observations)):
+                if value is not None:
+                    updated[field] = value
 
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                
-                update_fields = []
-                params = []
-
-                if exam_type is not None:
-                    update_fields.append("exam_type = %s")
-                    params.append(exam_type.strip())
-                if exam_date is not None:
-                    update_fields.append("exam_date = %s")
-                    params.append(exam_date)
-                if original_results is not None:
-                    update_fields.append("original_results = %s")
-                    params.append(original_results)
-                if exam_result is not None:
-                    update_fields.append("exam_result = %s")
-                    params.append(exam_result)
-                if observations is not None:
-                    update_fields.append("observations = %s")
-                    params.append(observations)
-
-                if not update_fields:
-                    return existing
-
-                update_fields.append("updated_at = CURRENT_TIMESTAMP")
-                params.append(str(analysis_id))
-
-                update_query = f"""
-                    UPDATE public.exam_analyses
-                    SET {', '.join(update_fields)}
-                    WHERE id = %s
-                    RETURNING *
-                """
-                cursor.execute(update_query, params)
-                updated = cursor.fetchone()
-                conn.commit()
-
-                if not updated:
-                    return None
-
-                logger.info(f"Exam analysis updated successfully: {analysis_id}")
-                return dict(updated)
-
-        except Exception as e:
-            logger.error(f"Error updating exam analysis: {e}")
-            raise Exception(f"Database error updating exam analysis: {str(e)}")
+            logger.debug("Exam analysis updated successfully: %s", analysis_id)
+            return updated
+
+        except psycopg2.Error as e:
+            logger.error("Error updating exam analysis: %s", e)
+            raise DatabaseError(f"Database error updating exam analysis: {e}") from e
 
     
     async def delete_exam_analysis(self, analysis_id: UUID) -> bool:
         
-        logger.info(f"Deleting exam analysis with ID: {analysis_id}")
+        logger.debug("Deleting exam analysis with ID: %s", analysis_id)
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    DELETE FROM public.exam_analyses
-                    WHERE id = %s
-                """
-                cursor.execute(query, (str(analysis_id),))
-                conn.commit()
-                success = cursor.rowcount > 0
-                if not success:
-                    logger.warning(f"Exam analysis not found: {analysis_id}")
-                else:
-                    logger.info(f"Exam analysis deleted successfully: {analysis_id}")
-                return success
-        except Exception as e:
-            logger.error(f"Error deleting exam analysis: {e}")
-            raise Exception(f"Database error deleting exam analysis: {str(e)}")
+            deleted = await db.fetch_one("del_exam_analysis", (analysis_id,))
+            if deleted is None:
+                logger.warning("Exam analysis not found: %s", analysis_id)
+                return False
+            _invalidate_responses(deleted["organizations_id"])
+            logger.debug("Exam analysis deleted successfully: %s", analysis_id)
+            return True
+        except psycopg2.Error as e:
+            logger.error("Error deleting exam analysis: %s", e)
+            raise DatabaseError(f"Database error deleting exam analysis: {e}") from e
+
+    
+    async def _organization_page(
+        self,
+        organization_name: str,
+        count_key: Tuple,
+        filters: List[Any],
+        flags: Tuple[bool, bool, bool, bool],
+        page: int,
+        page_size: int,
+        after_exam_date: Optional[datetime],
+        after_created_at: Optional[datetime],
+        after_id: Optional[UUID],
+    ) -> Dict[str, Any]:
+        
+        # Passing next_cursor's after_exam_date/after_created_at/after_id switches from
+        # OFFSET to keyset pagination. total_count is always the whole listing's, cached
+        # per filter for 30s. First pages are also kept in the response cache until the organization changes.
+        has_cursor = after_exam_date is not None and after_created_at is not None and after_id is not None
+        response_key = ("page", *count_key, page_size)
+        first_page = page == 1 and not has_cursor
+        if first_page:
+            cached = _cached_response(response_key)
+            if cached is not None:
+                return cached
+        sequence = _write_sequence
+        total_count = _analysis_count_cache.get(count_key)
+
+        params: List[Any] = [organization_name, *filters]
+        offset = (page - 1) * page_size
+        if has_cursor:
+            params.extend([after_exam_date, after_created_at, after_id, page_size])
+        else:
+            params.extend([page_size, offset])
+
+        statement = analysis_page_statement(*flags, has_cursor, total_count is None)
+        rows = await db.execute_query(statement, tuple(params))
+        if not rows:
+            raise Exception(f"Organization '{organization_name}' not found or is deleted")
+
+        items, total_count = _page_items(rows, count_key, total_count)
+        total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
+        result = {
+            "analyses": items,
+            "total_count": total_count,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": total_pages,
+            "next_cursor": _next_cursor(items, page_size),
+        }
+        # An empty page carries no organization id to invalidate it by
+        if first_page and items:
+            _cache_response(response_key, items[0]["organizations_id"], sequence, result)
+        return result
 
     
     async def get_organization_analyses(
@@ -214,70 +272,32 @@ class ExamAnalysisService:
         end_date: Optional[date] = None,
         page: int = 1,
         page_size: int = 50,
+        after_exam_date: Optional[datetime] = None,
+        after_created_at: Optional[datetime] = None,
+        after_id: Optional[UUID] = None,
     ) -> Dict[str, Any]:
         
-        logger.info(f"Fetching exam analyses for organization: {organization_name}")
+        logger.debug("Fetching exam analyses for organization: %s", organization_name)
 
         try:
-            
-            organization_id = await self._get_organization_id_by_name(organization_name)
-            if not organization_id:
-                raise Exception(f"Organization '{organization_name}' not found or is deleted")
+            filters = [value for value in (exam_type, start_date, end_date) if value]
+            result = await self._organization_page(
+                organization_name,
+                ("organization", organization_name, exam_type, start_date, end_date),
+                filters,
+                (bool(exam_type), bool(start_date), bool(end_date), False),
+                page,
+                page_size,
+                after_exam_date,
+                after_created_at,
+                after_id,
+            )
+            logger.debug("Found %s analyses for organization %s", len(result['analyses']), organization_name)
+            return result
 
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                
-                conditions = ["organizations_id = %s"]
-                params = [str(organization_id)]
-
-                if exam_type:
-                    conditions.append("exam_type = %s")
-                    params.append(exam_type)
-                if start_date:
-                    conditions.append("exam_date >= %s")
-                    params.append(start_date)
-                if end_date:
-                    conditions.append("exam_date <= %s")
-                    params.append(end_date)
-
-                where_clause = " AND ".join(conditions)
-
-                
-                count_query = f"""
-                    SELECT COUNT(*) as total
-                    FROM public.exam_analyses
-                    WHERE {where_clause}
-                """
-                cursor.execute(count_query, params)
-                total_count = cursor.fetchone()["total"]
-
-                
-                offset = (page - 1) * page_size
-                select_query = f"""
-                    SELECT *
-                    FROM public.exam_analyses
-                    WHERE {where_clause}
-                    ORDER BY exam_date DESC, created_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(select_query, params + [page_size, offset])
-                rows = cursor.fetchall()
-
-                items = [dict(row) for row in rows]
-                total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
-
-                logger.info(f"Found {len(items)} analyses for organization {organization_name}")
-                return {
-                    "analyses": items,
-                    "total_count": total_count,
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": total_pages,
-                }
-
-        except Exception as e:
-            logger.error(f"Error fetching organization analyses: {e}")
-            raise Exception(f"Database error fetching analyses: {str(e)}")
+        except psycopg2.Error as e:
+            logger.error("Error fetching organization analyses: %s", e)
+            raise DatabaseError(f"Database error fetching analyses: {e}") from e
 
     
     async def get_analyses_without_exam_result(
@@ -285,59 +305,31 @@ class ExamAnalysisService:
         organization_name: str,
         page: int = 1,
         page_size: int = 50,
+        after_exam_date: Optional[datetime] = None,
+        after_created_at: Optional[datetime] = None,
+        after_id: Optional[UUID] = None,
     ) -> Dict[str, Any]:
         
-        logger.info(f"Fetching analyses without exam_result for organization: {organization_name}")
+        logger.debug("Fetching analyses without exam_result for organization: %s", organization_name)
 
         try:
-            organization_id = await self._get_organization_id_by_name(organization_name)
-            if not organization_id:
-                raise Exception(f"Organization '{organization_name}' not found or is deleted")
-
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-
-                conditions = ["organizations_id = %s", "exam_result IS NULL"]
-                params = [str(organization_id)]
-
-                where_clause = " AND ".join(conditions)
+            result = await self._organization_page(
+                organization_name,
+                ("pending", organization_name),
+                [],
+                (False, False, False, True),
+                page,
+                page_size,
+                after_exam_date,
+                after_created_at,
+                after_id,
+            )
+            logger.debug("Found %s analyses without exam_result for %s", len(result['analyses']), organization_name)
+            return result
 
-                
-                count_query = f"""
-                    SELECT COUNT(*) as total
-                    FROM public.exam_analyses
-                    WHERE {where_clause}
-                """
-                cursor.execute(count_query, params)
-                total_count = cursor.fetchone()["total"]
-
-                
-                offset = (page - 1) * page_size
-                select_query = f"""
-                    SELECT *
-                    FROM public.exam_analyses
-                    WHERE {where_clause}
-                    ORDER BY exam_date DESC, created_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(select_query, params + [page_size, offset])
-                rows = cursor.fetchall()
-
-                items = [dict(row) for row in rows]
-                total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
-
-                logger.info(f"Found {len(items)} analyses without exam_result for {organization_name}")
-                return {
-                    "analyses": items,
-                    "total_count": total_count,
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": total_pages,
-                }
-
-        except Exception as e:
-            logger.error(f"Error fetching analyses without exam_result: {e}")
-            raise Exception(f"Database error fetching analyses: {str(e)}")
+        except psycopg2.Error as e:
+            logger.error("Error fetching analyses without exam_result: %s", e)
+            raise DatabaseError(f"Database error fetching analyses: {e}") from e
 
     
     async def get_analyses_by_exam_type(
@@ -346,14 +338,32 @@ class ExamAnalysisService:
         exam_type: str,
         page: int = 1,
         page_size: int = 50,
+        after_exam_date: Optional[datetime] = None,
+        after_created_at: Optional[datetime] = None,
+        after_id: Optional[UUID] = None,
     ) -> Dict[str, Any]:
         
-        return await self.get_organization_analyses(
-            organization_name=organization_name,
-            exam_type=exam_type,
-            page=page,
-            page_size=page_size,
-        )
+        logger.debug("Fetching %s analyses for organization: %s", exam_type, organization_name)
+
+        try:
+            # Always the sel_org_analyses_type statement, served by idx_exam_analyses_org_type_date
+            result = await self._organization_page(
+                organization_name,
+                ("organization", organization_name, exam_type, None, None),
+                [exam_type],
+                (True, False, False, False),
+                page,
+                page_size,
+                after_exam_date,
+                after_created_at,
+                after_id,
+            )
+            logger.debug("Found %s %s analyses for organization %s", len(result['analyses']), exam_type, organization_name)
+            return result
+
+        except psycopg2.Error as e:
+            logger.error("Error fetching analyses by exam type: %s", e)
+            raise DatabaseError(f"Database error fetching analyses: {e}") from e
 
     
     async def get_analysis_statistics(
@@ -363,69 +373,169 @@ class ExamAnalysisService:
         end_date: Optional[date] = None,
     ) -> Dict[str, Any]:
         
-        logger.info(f"Fetching analysis statistics for organization: {organization_name}")
+        logger.debug("Fetching analysis statistics for organization: %s", organization_name)
+
+        cache_key = ("statistics", organization_name, start_date, end_date)
+        cached = _cached_response(cache_key)
+        if cached is not None:
+            return cached
+        sequence = _write_sequence
 
         try:
-            organization_id = await self._get_organization_id_by_name(organization_name)
-            if not organization_id:
+            date_filter = ""
+            date_params: List[Any] = []
+            if start_date and end_date:
+                date_filter = " AND exam_date BETWEEN %s AND %s"
+                date_params = [start_date, end_date]
+            elif start_date:
+                date_filter = " AND exam_date >= %s"
+                date_params = [start_date]
+            elif end_date:
+                date_filter = " AND exam_date <= %s"
+                date_params = [end_date]
+            params = [organization_name, *date_params, *date_params]
+
+            # The organization is resolved in the same statement. Neither scan reads
+            # exam_result itself: totals and top types come from (organizations_id,
+            # exam_date) INCLUDE (exam_type), and the pending count from the partial
+            # index WHERE exam_result IS NULL, so both can be index-only instead of
+            # visiting every heap row with its jsonb payload.
+            stats_query = f"""
+                WITH org AS (
+                    SELECT id FROM public.organizations
+                    WHERE name = %s AND deleted_at IS NULL
+                    LIMIT 1
+                ),
+                f AS (
+                    SELECT exam_type
+                    FROM public.exam_analyses
+                    WHERE organizations_id = (SELECT id FROM org) {date_filter}
+                ),
+                pending AS (
+                    SELECT COUNT(*) as count
+                    FROM public.exam_analyses
+                    WHERE organizations_id = (SELECT id FROM org) AND exam_result IS NULL {date_filter}
+                )
+                SELECT
+                    (SELECT id FROM org) as organization_id,
+                    COUNT(*) as total_analyses,
+                    COUNT(*) - (SELECT count FROM pending) as analyses_with_result,
+                    (SELECT count FROM pending) as analyses_without_result,
+                    COALESCE((
+                        SELECT json_agg(t)
+                        FROM (
+                            SELECT exam_type, COUNT(*) as count
+                            FROM f
+                            GROUP BY exam_type
+                            ORDER BY count DESC
+                            LIMIT 5
+                        ) t
+                    ), '[]'::json) as top_exam_types
+                FROM f
+            """
+            counts = await db.fetch_one(stats_query, tuple(params))
+            organization_id = counts.pop("organization_id")
+            if organization_id is None:
                 raise Exception(f"Organization '{organization_name}' not found or is deleted")
+            _cache_response(cache_key, organization_id, sequence, counts)
+
+            logger.debug("Statistics fetched for %s", organization_name)
+            return counts
+
+        except psycopg2.Error as e:
+            logger.error("Error fetching analysis statistics: %s", e)
+            raise DatabaseError(f"Database error fetching statistics: {e}") from e
 
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-
-                params = [str(organization_id)]
-                date_filter = ""
-                if start_date and end_date:
-                    date_filter = " AND exam_date BETWEEN %s AND %s"
-                    params.extend([start_date, end_date])
-                elif start_date:
-                    date_filter = " AND exam_date >= %s"
-                    params.append(start_date)
-                elif end_date:
-                    date_filter = " AND exam_date <= %s"
-                    params.append(end_date)
-
-                
-                base_query = f"""
-                    SELECT
-                        COUNT(*) as total_analyses,
-                        COUNT(exam_result) as analyses_with_result,
-                        COUNT(*) - COUNT(exam_result) as analyses_without_result
+
+    async def get_analysis_statistics_batch(
+        self,
+        organization_names: List[str],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        
+        # get_analysis_statistics for several organizations: cached ones are served from
+        # the response cache and the rest share one query. Organizations that do not
+        # exist (or are deleted) are left out of the result.
+        logger.debug("Fetching analysis statistics for %s organizations", len(organization_names))
+
+        statistics: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for organization_name in dict.fromkeys(organization_names):
+            cached = _cached_response(("statistics", organization_name, start_date, end_date))
+            if cached is not None:
+                statistics[organization_name] = cached
+            else:
+                missing.append(organization_name)
+        if not missing:
+            return statistics
+        sequence = _write_sequence
+
+        try:
+            date_filter = ""
+            date_params: List[Any] = []
+            if start_date and end_date:
+                date_filter = " AND exam_date BETWEEN %s AND %s"
+                date_params = [start_date, end_date]
+            elif start_date:
+                date_filter = " AND exam_date >= %s"
+                date_params = [start_date]
+            elif end_date:
+                date_filter = " AND exam_date <= %s"
+                date_params = [end_date]
+            params = [missing, *date_params, *date_params, *date_params]
+
+            # Same index-only counts as get_analysis_statistics, once per organization
+            stats_query = f"""
+                WITH org AS (
+                    SELECT DISTINCT ON (name) id, name
+                    FROM public.organizations
+                    WHERE name = ANY(%s) AND deleted_at IS NULL
+                    ORDER BY name
+                )
+                SELECT
+                    org.id as organization_id,
+                    org.name as organization_name,
+                    total.count as total_analyses,
+                    total.count - pending.count as analyses_with_result,
+                    pending.count as analyses_without_result,
+                    COALESCE(top.exam_types, '[]'::json) as top_exam_types
+                FROM org
+                CROSS JOIN LATERAL (
+                    SELECT COUNT(*) as count
                     FROM public.exam_analyses
-                    WHERE organizations_id = %s {date_filter}
-                """
-                cursor.execute(base_query, params)
-                counts = dict(cursor.fetchone())
-
-                
-                type_query = f"""
-                    SELECT exam_type, COUNT(*) as count
+                    WHERE organizations_id = org.id {date_filter}
+                ) total
+                CROSS JOIN LATERAL (
+                    SELECT COUNT(*) as count
                     FROM public.exam_analyses
-                    WHERE organizations_id = %s {date_filter}
-                    GROUP BY exam_type
-                    ORDER BY count DESC
-                    LIMIT 5
-                """
-                               
-                
-                type_params = [str(organization_id)]
-                if start_date and end_date:
-                    type_params.extend([start_date, end_date])
-                elif start_date:
-                    type_params.append(start_date)
-                elif end_date:
-                    type_params.append(end_date)
-
-                cursor.execute(type_query, type_params)
-                top_types = [dict(row) for row in cursor.fetchall()]
-
-                counts["top_exam_types"] = top_types
-                logger.info(f"Statistics fetched for {organization_name}")
-                return counts
-
-        except Exception as e:
-            logger.error(f"Error fetching analysis statistics: {e}")
-            raise Exception(f"Database error fetching statistics: {str(e)}")
+                    WHERE organizations_id = org.id AND exam_result IS NULL {date_filter}
+                ) pending
+                CROSS JOIN LATERAL (
+                    SELECT json_agg(t) as exam_types
+                    FROM (
+                        SELECT exam_type, COUNT(*) as count
+                        FROM public.exam_analyses
+                        WHERE organizations_id = org.id {date_filter}
+                        GROUP BY exam_type
+                        ORDER BY count DESC
+                        LIMIT 5
+                    ) t
+                ) top
+            """
+            rows = await db.execute_query(stats_query, tuple(params))
+            for row in rows:
+                organization_id = row.pop("organization_id")
+                organization_name = row.pop("organization_name")
+                _cache_response(("statistics", organization_name, start_date, end_date), organization_id, sequence, row)
+                statistics[organization_name] = row
+
+            logger.debug("Statistics fetched for %s organizations", len(statistics))
+            return statistics
+
+        except psycopg2.Error as e:
+            logger.error("Error fetching analysis statistics batch: %s", e)
+            raise DatabaseError(f"Database error fetching statistics: {e}") from e
 
 
 # Global instance
@@ -1,53 +1,65 @@
+import asyncio
 import logging
 from uuid import UUID
-from datetime import date
-from typing import List, Optional, Dict, Any
+from datetime import date, datetime
+from typing import List, Optional, Dict, Any, FrozenSet, Tuple
+from psycopg2.extras import execute_values
 from app.database import db
 
 logger = logging.getLogger(__name__)
 
 
+def _check_org_patient(row: Dict[str, Any], organization_name: str, patient_name: Optional[str]) -> None:
+    # Raises the lookup errors for the EXAM_ORG_PATIENT_CHECK_COLUMNS of `row`
+    if not row["organization_found"]:
+        raise Exception(f"Organization '{organization_name}' not found or is deleted")
+    if patient_name is None:
+        return
+    if row["patient_matches"] == 0:
+        raise Exception(f"Patient '{patient_name}' not found in organization '{organization_name}'")
+    if row["patient_matches"] > 1:
+        raise Exception(
+            f"Multiple patients with name '{patient_name}' found in organization. "
+            "Please use CPF/SSN or patient ID."
+        )
+
+
+def _page_total(rows: List[Dict[str, Any]]) -> Optional[int]:
+    # Strips the window total (and any lookup check columns) from the page rows and
+    # returns it; None when the page is empty and the total is unknown
+    total_count = rows[0]["total_count"] if rows else None
+    for row in rows:
+        del row["total_count"]
+        row.pop("organization_found", None)
+        row.pop("patient_matches", None)
+    return total_count
+
+
+def _next_cursor(exams: List[Dict[str, Any]], page_size: int) -> Optional[Dict[str, Any]]:
+    # Keyset cursor for the page after `exams`; None once a short page is returned
+    if len(exams) < page_size:
+        return None
+    last = exams[-1]
+    return {
+        "after_requested_at": last["requested_at"],
+        "after_created_at": last["created_at"],
+        "after_id": str(last["id"]),
+    }
+
+
 class ExamService:
 
+    # _STATUSES keeps the order used in messages and count results; lookups use the frozenset
+    _STATUSES: Tuple[str, ...] = ("pending", "scheduled", "completed", "cancelled", "in_progress")
+    _VALID_STATUSES: FrozenSet[str] = frozenset(_STATUSES)
     
     async def _get_organization_id_by_name(self, organization_name: str) -> Optional[UUID]:
         
         logger.debug(f"Resolving organization ID for name: {organization_name}")
-        async with db.get_async_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT id FROM public.organizations WHERE name = %s AND deleted_at IS NULL",
-                (organization_name,)
-            )
-            org = cursor.fetchone()
-            if not org:
-                return None
-            return UUID(org['id'])
+        # Cached, and concurrent lookups of the same name share one query
+        organization_id = await db.get_active_organization_id_async(organization_name)
+        return UUID(str(organization_id)) if organization_id else None
 
-    async def _get_patient_id_by_name_and_organization(
-        self,
-        patient_name: str,
-        organization_id: UUID
-    ) -> Optional[UUID]:
-        
-        logger.debug(f"Resolving patient ID for name '{patient_name}' in organization {organization_id}")
-        async with db.get_async_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT id FROM public.patients WHERE name = %s AND organization_id = %s AND deleted_at IS NULL",
-                (patient_name, str(organization_id))
-            )
-            rows = cursor.fetchall()
-            if not rows:
-                return None
-            if len(rows) > 1:
-                raise Exception(
-                    f"Multiple patients with name '{patient_name}' found in organization. "
-                    "Please use CPF/SSN or patient ID."
-                )
-            return UUID(rows[0]['id'])
-
-    
     async def create_exam(
         self,
         organization_name: str,
@@ -63,80 +75,116 @@ class ExamService:
         if not exam_type:
             raise Exception("Exam type cannot be empty")
 
-        valid_statuses = ["pending", "scheduled", "completed", "cancelled", "in_progress"]
-        if status not in valid_statuses:
-            raise Exception(f"Invalid status. Must be one of: {valid_statuses}")
+        if status not in self._VALID_STATUSES:
+            raise Exception(f"Invalid status. Must be one of: {list(self._STATUSES)}")
 
         try:
-            
-            organization_id = await self._get_organization_id_by_name(organization_name)
-            if not organization_id:
-                raise Exception(f"Organization '{organization_name}' not found or is deleted")
-
-            
-            patient_id = None
-            if patient_name:
-                patient_id = await self._get_patient_id_by_name_and_organization(patient_name, organization_id)
-                if not patient_id:
-                    raise Exception(
-                        f"Patient '{patient_name}' not found in organization '{organization_name}'"
-                    )
-
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-
-                
-                insert_query = """
-                    INSERT INTO public.medical_exams (
-                        organization_id, patient_id, exam_type, status,
-                        requested_at, notes, created_at, updated_at
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
-                    )
-                    RETURNING *
-                """
-                cursor.execute(
-                    insert_query,
-                    (
-                        str(organization_id),
-                        str(patient_id) if patient_id else None,
-                        exam_type,
-                        status,
-                        requested_at,
-                        notes,
-                    ),
-                )
-
-                created_exam = cursor.fetchone()
-                conn.commit()
+            # Organization and patient lookups and the INSERT in one round trip; nothing
+            # is inserted unless both resolve
+            patient_name = patient_name or None
+            created_exam = await db.fetch_one(
+                "ins_exam",
+                (organization_name, patient_name, exam_type, status, requested_at, notes),
+            )
 
-                if not created_exam:
-                    raise Exception("Failed to create exam")
+            _check_org_patient(created_exam, organization_name, patient_name)
+            del created_exam["organization_found"], created_exam["patient_matches"]
+            if created_exam["id"] is None:
+                raise Exception("Failed to create exam")
 
-                logger.info(f"Exam created successfully with ID: {created_exam['id']}")
-                return dict(created_exam)
+            logger.info(f"Exam created successfully with ID: {created_exam['id']}")
+            return created_exam
 
         except Exception as e:
             logger.error(f"Error creating exam: {e}")
             raise Exception(f"Database error creating exam: {str(e)}")
 
+    async def bulk_create_exams(self, exams: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Each item takes the create_exam arguments. Organizations and patients for the
+        # whole batch are resolved in one query, then every exam goes in through
+        # execute_values and a single commit; nothing is inserted if any item fails.
+        logger.info(f"Bulk creating {len(exams)} exams")
+        if not exams:
+            return []
+
+        for exam in exams:
+            if not exam.get("exam_type"):
+                raise Exception("Exam type cannot be empty")
+            if exam.get("status", "pending") not in self._VALID_STATUSES:
+                raise Exception(f"Invalid status. Must be one of: {list(self._STATUSES)}")
+
+        try:
+            organization_names = list({exam["organization_name"] for exam in exams})
+            patient_names = list({exam["patient_name"] for exam in exams if exam.get("patient_name")})
+            found = await db.execute_query(
+                "sel_exam_orgs_patients_by_names", (organization_names, patient_names)
+            )
+
+            organization_ids: Dict[str, Any] = {}
+            patient_ids: Dict[Tuple[str, str], List[Any]] = {}
+            for row in found:
+                organization_ids.setdefault(row["organization_name"], row["organization_id"])
+                if row["patient_id"] is not None:
+                    patient_ids.setdefault(
+                        (row["organization_id"], row["patient_name"]), []
+                    ).append(row["patient_id"])
+
+            rows = []
+            for exam in exams:
+                organization_name = exam["organization_name"]
+                patient_name = exam.get("patient_name") or None
+                organization_id = organization_ids.get(organization_name)
+                matches = patient_ids.get((organization_id, patient_name), [])
+                _check_org_patient(
+                    {"organization_found": organization_id is not None, "patient_matches": len(matches)},
+                    organization_name,
+                    patient_name,
+                )
+                rows.append((
+                    organization_id, matches[0] if matches else None, exam["exam_type"],
+                    exam.get("status", "pending"), exam.get("requested_at"), exam.get("notes"),
+                ))
+
+            created_exams = await asyncio.to_thread(self._insert_exams, rows)
+            logger.info(f"Bulk create completed: {len(created_exams)} exams created")
+            return created_exams
+
+        except Exception as e:
+            logger.error(f"Error in bulk create exams: {e}")
+            raise Exception(f"Database error in bulk create: {str(e)}")
+
+    @staticmethod
+    def _insert_exams(rows: List[tuple]) -> List[Dict[str, Any]]:
+        with db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                created_exams = execute_values(
+                    cursor,
+                    """
+                        INSERT INTO public.medical_exams (
+                            organization_id, patient_id, exam_type, status,
+                            requested_at, notes, created_at, updated_at
+                        )
+                        VALUES %s
+                        RETURNING *
+                    """,
+                    rows,
+                    template="(%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)",
+                    page_size=500,
+                    fetch=True,
+                )
+                conn.commit()
+                return created_exams
+
     
     async def get_exam_by_id(self, exam_id: UUID) -> Optional[Dict[str, Any]]:
         logger.info(f"Fetching exam by ID: {exam_id}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT * FROM public.medical_exams
-                    WHERE id = %s AND deleted_at IS NULL
-                """
-                cursor.execute(query, (str(exam_id),))
-                exam = cursor.fetchone()
-                if not exam:
-                    logger.warning(f"Exam not found with ID: {exam_id}")
-                    return None
-                logger.info(f"Exam found: {exam_id}")
-                return dict(exam)
+            exam = await db.fetch_one("sel_exam", (exam_id,))
+            if not exam:
+                logger.warning(f"Exam not found with ID: {exam_id}")
+                return None
+            logger.info(f"Exam found: {exam_id}")
+            return exam
         except Exception as e:
             logger.error(f"Error fetching exam: {e}")
             raise Exception(f"Database error fetching exam: {str(e)}")
@@ -155,70 +203,36 @@ class ExamService:
         logger.info(f"Updating exam with ID: {exam_id}")
 
         if status is not None:
-            valid_statuses = ["pending", "scheduled", "completed", "cancelled", "in_progress"]
-            if status not in valid_statuses:
-                raise Exception(f"Invalid status. Must be one of: {valid_statuses}")
+            if status not in self._VALID_STATUSES:
+                raise Exception(f"Invalid status. Must be one of: {list(self._STATUSES)}")
 
         try:
-            
-            current_exam = await self.get_exam_by_id(exam_id)
-            if not current_exam:
-                return None
+            if all(value is None for value in (exam_type, status, requested_at, notes, patient_name)):
+                return await self.get_exam_by_id(exam_id)
 
-            
-            patient_id = None
-            if patient_name is not None:
-                org_id = UUID(current_exam["organization_id"])
-                patient_id = await self._get_patient_id_by_name_and_organization(patient_name, org_id)
-                if not patient_id:
-                    raise Exception(
-                        f"Patient '{patient_name}' not found in the organization of this exam"
-                    )
-
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-
-                
-                update_fields = []
-                params = []
-
-                if exam_type is not None:
-                    update_fields.append("exam_type = %s")
-                    params.append(exam_type)
-                if status is not None:
-                    update_fields.append("status = %s")
-                    params.append(status)
-                if requested_at is not None:
-                    update_fields.append("requested_at = %s")
-                    params.append(requested_at)
-                if notes is not None:
-                    update_fields.append("notes = %s")
-                    params.append(notes)
-                if patient_name is not None:
-                    update_fields.append("patient_id = %s")
-                    params.append(str(patient_id) if patient_id else None)
-
-                if not update_fields:
-                    return current_exam
-
-                update_fields.append("updated_at = CURRENT_TIMESTAMP")
-                params.append(str(exam_id))
-
-                update_query = f"""
-                    UPDATE public.medical_exams
-                    SET {', '.join(update_fields)}
-                    WHERE id = %s AND deleted_at IS NULL
-                    RETURNING *
-                """
-                cursor.execute(update_query, params)
-                updated_exam = cursor.fetchone()
-                conn.commit()
+            # The exam's organization and the patient are resolved in the same statement;
+            # the row is only updated when the name matches exactly one patient there
+            updated_exam = await db.fetch_one(
+                "upd_exam", (exam_type, status, requested_at, notes, patient_name, exam_id)
+            )
 
-                if not updated_exam:
-                    return None
+            if not updated_exam.pop("exam_found"):
+                return None
+            patient_matches = updated_exam.pop("patient_matches")
+            if patient_name is not None and patient_matches == 0:
+                raise Exception(
+                    f"Patient '{patient_name}' not found in the organization of this exam"
+                )
+            if patient_name is not None and patient_matches > 1:
+                raise Exception(
+                    f"Multiple patients with name '{patient_name}' found in organization. "
+                    "Please use CPF/SSN or patient ID."
+                )
+            if updated_exam["id"] is None:
+                return None
 
-                logger.info(f"Exam updated successfully: {exam_id}")
-                return dict(updated_exam)
+            logger.info(f"Exam updated successfully: {exam_id}")
+            return updated_exam
 
         except Exception as e:
             logger.error(f"Error updating exam: {e}")
@@ -228,21 +242,12 @@ class ExamService:
     async def delete_exam(self, exam_id: UUID) -> bool:
         logger.info(f"Deleting exam with ID: {exam_id}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    UPDATE public.medical_exams
-                    SET deleted_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s AND deleted_at IS NULL
-                """
-                cursor.execute(query, (str(exam_id),))
-                conn.commit()
-                success = cursor.rowcount > 0
-                if not success:
-                    logger.warning(f"Exam not found or already deleted: {exam_id}")
-                    return False
-                logger.info(f"Exam deleted successfully: {exam_id}")
-                return True
+            success = await db.execute_update("del_exam", (exam_id,))
+            if not success:
+                logger.warning(f"Exam not found or already deleted: {exam_id}")
+                return False
+            logger.info(f"Exam deleted successfully: {exam_id}")
+            return True
         except Exception as e:
             logger.error(f"Error deleting exam: {e}")
             raise Exception(f"Database error deleting exam: {str(e)}")
@@ -250,22 +255,12 @@ class ExamService:
     async def restore_exam(self, exam_id: UUID) -> Optional[Dict[str, Any]]:
         logger.info(f"Restoring exam: {exam_id}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    UPDATE public.medical_exams
-                    SET deleted_at = NULL, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s AND deleted_at IS NOT NULL
-                    RETURNING *
-                """
-                cursor.execute(query, (str(exam_id),))
-                restored_exam = cursor.fetchone()
-                conn.commit()
-                if not restored_exam:
-                    logger.warning(f"Exam not found or not deleted: {exam_id}")
-                    return None
-                logger.info(f"Exam restored successfully: {exam_id}")
-                return dict(restored_exam)
+            restored_exam = await db.fetch_one("restore_exam", (exam_id,))
+            if not restored_exam:
+                logger.warning(f"Exam not found or not deleted: {exam_id}")
+                return None
+            logger.info(f"Exam restored successfully: {exam_id}")
+            return restored_exam
         except Exception as e:
             logger.error(f"Error restoring exam: {e}")
             raise Exception(f"Database error restoring exam: {str(e)}")
@@ -282,87 +277,68 @@ class ExamService:
         end_date: Optional[date] = None,
         page: int = 1,
         page_size: int = 50,
+        after_requested_at: Optional[date] = None,
+        after_created_at: Optional[datetime] = None,
+        after_id: Optional[UUID] = None,
     ) -> Dict[str, Any]:
 
         logger.info(f"Fetching exams for organization: {organization_name}")
 
         try:
-            
-            organization_id = await self._get_organization_id_by_name(organization_name)
-            if not organization_id:
-                raise Exception(f"Organization '{organization_name}' not found or is deleted")
+            # Organization and patient are resolved inside the page statement instead of
+            # by separate lookups first
+            patient_name = patient_name or None
+            params = (
+                organization_name, patient_name, status or None, exam_type or None,
+                start_date, end_date,
+            )
 
-            
-            patient_id = None
-            if patient_name:
-                patient_id = await self._get_patient_id_by_name_and_organization(patient_name, organization_id)
-                if not patient_id:
-                    raise Exception(
-                        f"Patient '{patient_name}' not found in organization '{organization_name}'"
-                    )
-
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-
-                conditions = ["organization_id = %s", "deleted_at IS NULL"]
-                params = [str(organization_id)]
-
-                if patient_id:
-                    conditions.append("patient_id = %s")
-                    params.append(str(patient_id))
-                if status:
-                    conditions.append("status = %s")
-                    params.append(status)
-                if exam_type:
-                    conditions.append("exam_type = %s")
-                    params.append(exam_type)
-                if start_date:
-                    conditions.append("requested_at >= %s")
-                    params.append(start_date)
-                if end_date:
-                    conditions.append("requested_at <= %s")
-                    params.append(end_date)
-
-                where_clause = " AND ".join(conditions)
-
-                
-                count_query = f"""
-                    SELECT COUNT(*) as total
-                    FROM public.medical_exams
-                    WHERE {where_clause}
-                """
-                cursor.execute(count_query, params)
-                total_count = cursor.fetchone()["total"]
-
-                
-                offset = (page - 1) * page_size
-                select_query = f"""
-                    SELECT *
-                    FROM public.medical_exams
-                    WHERE {where_clause}
-                    ORDER BY requested_at DESC NULLS LAST, created_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(select_query, params + [page_size, offset])
-                exams = cursor.fetchall()
-
-                exams_list = [dict(exam) for exam in exams]
-                total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
-
-                logger.info(f"Found {len(exams_list)} exams for organization {organization_name}")
-                return {
-                    "exams": exams_list,
-                    "total_count": total_count,
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": total_pages,
-                }
+            offset = (page - 1) * page_size
+            exams_list, total_count = await self._exams_page(
+                params, organization_name, patient_name, page_size, offset,
+                (after_requested_at, after_created_at, after_id),
+            )
+            total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
+
+            logger.info(f"Found {len(exams_list)} exams for organization {organization_name}")
+            return {
+                "exams": exams_list,
+                "total_count": total_count,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": total_pages,
+                "next_cursor": _next_cursor(exams_list, page_size),
+            }
 
         except Exception as e:
             logger.error(f"Error fetching organization exams: {e}")
             raise Exception(f"Database error fetching exams: {str(e)}")
 
     
+    async def _exams_page(self, params: tuple, organization_name: str, patient_name: Optional[str],
+                          page_size: int, offset: int, cursor: Tuple) -> Tuple[List[Dict[str, Any]], int]:
+        # Passing next_cursor's after_created_at/after_id (after_requested_at is None for
+        # exams without a date) switches from OFFSET to keyset pagination. One round trip
+        # either way; only an OFFSET page past the end needs the separate count.
+        after_requested_at, after_created_at, after_id = cursor
+        if after_created_at is not None and after_id is not None:
+            rows = await db.execute_query(
+                "sel_exams_page_after",
+                params + (page_size, after_requested_at, after_created_at, after_id),
+            )
+        else:
+            rows = await db.execute_query("sel_exams_page", params + (page_size, offset))
+        _check_org_patient(rows[0], organization_name, patient_name)
+        total_count = rows[0]["total_count"]
+        exams_list = [row for row in rows if row["id"] is not None]
+        _page_total(exams_list)
+        if total_count is None:
+            total_count = 0
+            if offset > 0:
+                total_count = (await db.fetch_one("sel_exams_count", params))["total"]
+        return exams_list, total_count
+
+    
     async def get_patient_exams(
         self,
         patient_name: str,
@@ -372,76 +348,33 @@ class ExamService:
         end_date: Optional[date] = None,
         page: int = 1,
         page_size: int = 50,
+        after_requested_at: Optional[date] = None,
+        after_created_at: Optional[datetime] = None,
+        after_id: Optional[UUID] = None,
     ) -> Dict[str, Any]:
 
         logger.info(f"Fetching exams for patient: {patient_name} in organization: {organization_name}")
 
         try:
-            
-            organization_id = await self._get_organization_id_by_name(organization_name)
-            if not organization_id:
-                raise Exception(f"Organization '{organization_name}' not found or is deleted")
+            # Same statement as get_organization_exams, with the patient filter always set
+            params = (organization_name, patient_name, status or None, None, start_date, end_date)
 
-            
-            patient_id = await self._get_patient_id_by_name_and_organization(patient_name, organization_id)
-            if not patient_id:
-                raise Exception(
-                    f"Patient '{patient_name}' not found in organization '{organization_name}'"
-                )
-
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-
-                conditions = ["patient_id = %s", "deleted_at IS NULL"]
-                params = [str(patient_id)]
-
-                conditions.append("organization_id = %s")
-                params.append(str(organization_id))
-
-                if status:
-                    conditions.append("status = %s")
-                    params.append(status)
-                if start_date:
-                    conditions.append("requested_at >= %s")
-                    params.append(start_date)
-                if end_date:
-                    conditions.append("requested_at <= %s")
-                    params.append(end_date)
-
-                where_clause = " AND ".join(conditions)
-
-                
-                count_query = f"""
-                    SELECT COUNT(*) as total
-                    FROM public.medical_exams
-                    WHERE {where_clause}
-                """
-                cursor.execute(count_query, params)
-                total_count = cursor.fetchone()["total"]
-
-                
-                offset = (page - 1) * page_size
-                select_query = f"""
-                    SELECT *
-                    FROM public.medical_exams
-                    WHERE {where_clause}
-                    ORDER BY requested_at DESC NULLS LAST, created_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(select_query, params + [page_size, offset])
-                exams = cursor.fetchall()
-
-                exams_list = [dict(exam) for exam in exams]
-                total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
-
-                logger.info(f"Found {len(exams_list)} exams for patient {patient_name}")
-                return {
-                    "exams": exams_list,
-                    "total_count": total_count,
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": total_pages,
-                }
+            offset = (page - 1) * page_size
+            exams_list, total_count = await self._exams_page(
+                params, organization_name, patient_name, page_size, offset,
+                (after_requested_at, after_created_at, after_id),
+            )
+            total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
+
+            logger.info(f"Found {len(exams_list)} exams for patient {patient_name}")
+            return {
+                "exams": exams_list,
+                "total_count": total_count,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": total_pages,
+                "next_cursor": _next_cursor(exams_list, page_size),
+            }
 
         except Exception as e:
             logger.error(f"Error fetching patient exams: {e}")
@@ -450,25 +383,15 @@ class ExamService:
     
     async def update_exam_status(self, exam_id: UUID, status: str) -> bool:
         logger.info(f"Updating exam status: {exam_id} -> {status}")
-        valid_statuses = ["pending", "scheduled", "completed", "cancelled", "in_progress"]
-        if status not in valid_statuses:
-            raise Exception(f"Invalid status. Must be one of: {valid_statuses}")
+        if status not in self._VALID_STATUSES:
+            raise Exception(f"Invalid status. Must be one of: {list(self._STATUSES)}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    UPDATE public.medical_exams
-                    SET status = %s, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s AND deleted_at IS NULL
-                """
-                cursor.execute(query, (status, str(exam_id)))
-                conn.commit()
-                success = cursor.rowcount > 0
-                if not success:
-                    logger.warning(f"Exam not found or not updated: {exam_id}")
-                    return False
-                logger.info(f"Exam status updated successfully: {exam_id}")
-                return True
+            success = await db.execute_update("upd_exam_status", (status, exam_id))
+            if not success:
+                logger.warning(f"Exam not found or not updated: {exam_id}")
+                return False
+            logger.info(f"Exam status updated successfully: {exam_id}")
+            return True
         except Exception as e:
             logger.error(f"Error updating exam status: {e}")
             raise Exception(f"Database error updating exam status: {str(e)}")
@@ -477,33 +400,15 @@ class ExamService:
         logger.info(f"Bulk updating status for {len(exam_ids)} exams to {status}")
         if not exam_ids:
             return 0
-        valid_statuses = ["pending", "scheduled", "completed", "cancelled", "in_progress"]
-        if status not in valid_statuses:
-            raise Exception(f"Invalid status. Must be one of: {valid_statuses}")
+        if status not in self._VALID_STATUSES:
+            raise Exception(f"Invalid status. Must be one of: {list(self._STATUSES)}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                id_strings = [str(eid) for eid in exam_ids]
-
-                update_query = """
-                    UPDATE public.medical_exams
-                    SET status = %s, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ANY(%s::uuid[]) AND deleted_at IS NULL
-                """
-                cursor.execute(update_query, (status, id_strings))
-                conn.commit()
-
-                verify_query = """
-                    SELECT COUNT(*) as updated_count
-                    FROM public.medical_exams
-                    WHERE id = ANY(%s::uuid[]) AND status = %s AND deleted_at IS NULL
-                """
-                cursor.execute(verify_query, (id_strings, status))
-                count_result = cursor.fetchone()
-                updated_count = count_result["updated_count"] if count_result else 0
+            # The UPDATE reports the rows it changed; no follow-up count query
+            updated = await db.execute_query("upd_exam_status_bulk", (status, list(exam_ids)))
+            updated_count = len(updated)
 
-                logger.info(f"Bulk update completed: {updated_count} exams updated")
-                return updated_count
+            logger.info(f"Bulk update completed: {updated_count} exams updated")
+            return updated_count
 
         except Exception as e:
             logger.error(f"Error in bulk update status: {e}")
@@ -524,36 +429,16 @@ class ExamService:
             if not organization_id:
                 raise Exception(f"Organization '{organization_name}' not found or is deleted")
 
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-
-                conditions = ["organization_id = %s", "deleted_at IS NULL"]
-                params = [str(organization_id)]
-
-                if start_date:
-                    conditions.append("requested_at >= %s")
-                    params.append(start_date)
-                if end_date:
-                    conditions.append("requested_at <= %s")
-                    params.append(end_date)
-
-                where_clause = " AND ".join(conditions)
-
-                query = f"""
-                    SELECT status, COUNT(*) as count
-                    FROM public.medical_exams
-                    WHERE {where_clause}
-                    GROUP BY status
-                """
-                cursor.execute(query, params)
-                results = cursor.fetchall()
+            results = await db.execute_query(
+                "sel_exam_status_counts", (organization_id, start_date, end_date)
+            )
 
-                counts = {row["status"]: row["count"] for row in results}
-                for s in ["pending", "scheduled", "completed", "cancelled", "in_progress"]:
-                    counts.setdefault(s, 0)
+            counts = {row["status"]: row["count"] for row in results}
+            for s in self._STATUSES:
+                counts.setdefault(s, 0)
 
-                logger.info(f"Exam counts fetched for organization {organization_name}")
-                return counts
+            logger.info(f"Exam counts fetched for organization {organization_name}")
+            return counts
 
         except Exception as e:
             logger.error(f"Error fetching exam counts: {e}")
@@ -576,49 +461,26 @@ class ExamService:
             if not organization_id:
                 raise Exception(f"Organization '{organization_name}' not found or is deleted")
 
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-
-                conditions = [
-                    "organization_id = %s",
-                    "deleted_at IS NULL",
-                    "requested_at >= %s",
-                    "requested_at <= %s",
-                ]
-                params = [str(organization_id), from_date, to_date]
-
-                where_clause = " AND ".join(conditions)
-
-                count_query = f"""
-                    SELECT COUNT(*) as total
-                    FROM public.medical_exams
-                    WHERE {where_clause}
-                """
-                cursor.execute(count_query, params)
-                total_count = cursor.fetchone()["total"]
-
-                offset = (page - 1) * page_size
-                select_query = f"""
-                    SELECT *
-                    FROM public.medical_exams
-                    WHERE {where_clause}
-                    ORDER BY requested_at ASC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(select_query, params + [page_size, offset])
-                exams = cursor.fetchall()
-
-                exams_list = [dict(exam) for exam in exams]
-                total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
-
-                logger.info(f"Found {len(exams_list)} upcoming exams")
-                return {
-                    "exams": exams_list,
-                    "total_count": total_count,
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": total_pages,
-                }
+            params = (organization_id, from_date, to_date)
+            offset = (page - 1) * page_size
+            exams_list = await db.execute_query(
+                "sel_exams_requested_between", params + (page_size, offset)
+            )
+            total_count = _page_total(exams_list)
+            if total_count is None:
+                total_count = 0
+                if offset > 0:
+                    total_count = (await db.fetch_one("sel_exams_requested_between_count", params))["total"]
+            total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
+
+            logger.info(f"Found {len(exams_list)} upcoming exams")
+            return {
+                "exams": exams_list,
+                "total_count": total_count,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": total_pages,
+            }
 
         except Exception as e:
             logger.error(f"Error fetching upcoming exams: {e}")
@@ -634,22 +496,9 @@ class ExamService:
             if not organization_id:
                 raise Exception(f"Organization '{organization_name}' not found or is deleted")
 
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT *
-                    FROM public.medical_exams
-                    WHERE organization_id = %s
-                      AND patient_id IS NULL
-                      AND deleted_at IS NULL
-                    ORDER BY requested_at DESC, created_at DESC
-                """
-                cursor.execute(query, (str(organization_id),))
-                exams = cursor.fetchall()
-
-                exams_list = [dict(exam) for exam in exams]
-                logger.info(f"Found {len(exams_list)} exams without patient")
-                return exams_list
+            exams_list = await db.execute_query("sel_exams_without_patient", (organization_id,))
+            logger.info(f"Found {len(exams_list)} exams without patient")
+            return exams_list
 
         except Exception as e:
             logger.error(f"Error fetching exams without patient: {e}")
@@ -660,19 +509,10 @@ class ExamService:
         
         logger.info(f"Fetching patient name for exam ID: {exam_id}")
         try:
-            async with db.get_async_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT p.name
-                    FROM public.medical_exams e
-                    LEFT JOIN public.patients p ON e.patient_id = p.id AND p.deleted_at IS NULL
-                    WHERE e.id = %s AND e.deleted_at IS NULL
-                """
-                cursor.execute(query, (str(exam_id),))
-                result = cursor.fetchone()
-                if result:
-                    return result['name']
-                return None
+            result = await db.fetch_one("sel_exam_patient_name", (exam_id,))
+            if result:
+                return result['name']
+            return None
         except Exception as e:
             logger.error(f"Error fetching patient name for exam {exam_id}: {e}")
             raise Exception(f"Database error fetching patient name: {str(e)}")
@@ -8,15 +8,16 @@ from typing import Dict, Any, Optional
 from uuid import UUID
 
 
-import jwt
 from app import exam_analysis_service
 from fastapi import FastAPI, HTTPException, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 
-from app.auth_service import auth_token_service
-from app.database import db
+from app.auth_service import get_auth_token_service
+from app.database import db, db_secondary
 from app.exam_service import exam_service
+from app.exam_analysis_service import exam_analysis_service as analysis_service
+from app.exam_analysis_audit_service import exam_analysis_audit_service as audit_service
 from app.schemas import (  # NOTA: os schemas precisarão ser ajustados para REMOVER o campo 'token'
     AnalysesByTypeQuery,
     AnalysesByTypeRequest,
@@ -90,6 +91,8 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    db.close()
+    db_secondary.close()
     logger.info("Exam service stopped")
 
 # -----------------------------------------------------------------------------
@@ -113,24 +116,15 @@ async def get_token_data_from_header(authorization: str = Header(...)) -> Dict[s
     if not token:
         raise HTTPException(status_code=401, detail="Token is required")
 
-    if not auth_token_service.validate_token(token):
+    # O payload vem do cache ou da linha em auth_tokens: não há um segundo jwt.decode aqui
+    payload = await get_auth_token_service().validate_token_async(token)
+    if payload is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    try:
-        decoded_token = jwt.decode(
-            token,
-            auth_token_service.jwt_secret,
-            algorithms=["HS256"]
-        )
-        return {
-            "client_id": decoded_token.get("client_id"),
-            "token": token,
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=401,
-            detail=f"Token validation failed: {str(e)}"
-        )
+    return {
+        "client_id": payload.get("client_id"),
+        "token": token,
+    }
 
 # -----------------------------------------------------------------------------
 # Função auxiliar para manter compatibilidade durante migração (pode ser removida depois)
@@ -156,7 +150,7 @@ async def generate_auth_token(auth_request: AuthTokenRequest):
                 status_code=400,
                 detail="Both 'client_id' and 'client_secret' are required"
             )
-        result = auth_token_service.generate_token(
+        result = await get_auth_token_service().generate_token_async(
             auth_request.client_id,
             auth_request.client_secret
         )
@@ -177,7 +171,7 @@ async def validate_auth_token(
 @app.get("/auth/token/{client_id}", tags=["auth"])
 async def get_valid_token(client_id: str):
     """Get valid token for client_id (if any). This endpoint is public."""
-    token = auth_token_service.get_valid_token(client_id)
+    token = get_auth_token_service().get_valid_token(client_id)
     if not token:
         raise HTTPException(status_code=404, detail="No valid token found")
     return {"token": token}
@@ -191,7 +185,7 @@ async def cleanup_tokens(
     Requires valid JWT token in Authorization header.
     """
     # Aqui você pode adicionar verificação de permissão de admin se necessário
-    deleted_count = auth_token_service.cleanup_expired_tokens()
+    deleted_count = get_auth_token_service().cleanup_expired_tokens()
     return {"message": f"Cleaned up {deleted_count} expired tokens"}
 
 # =============================================================================
@@ -292,6 +286,9 @@ async def get_organization_exams(
             end_date=request.end_date,
             page=request.page,
             page_size=request.page_size,
+            after_requested_at=request.after_requested_at,
+            after_created_at=request.after_created_at,
+            after_id=request.after_id,
         )
         return result
     except Exception as e:
@@ -315,6 +312,9 @@ async def get_patient_exams(
             end_date=request.end_date,
             page=request.page,
             page_size=request.page_size,
+            after_requested_at=request.after_requested_at,
+            after_created_at=request.after_created_at,
+            after_id=request.after_id,
         )
         return result
     except Exception as e:
@@ -434,6 +434,9 @@ async def get_organization_exams(
             end_date=query.end_date,
             page=query.page,
             page_size=query.page_size,
+            after_requested_at=query.after_requested_at,
+            after_created_at=query.after_created_at,
+            after_id=query.after_id,
         )
         return result
     except Exception as e:
@@ -455,6 +458,9 @@ async def get_patient_exams(
             end_date=query.end_date,
             page=query.page,
             page_size=query.page_size,
+            after_requested_at=query.after_requested_at,
+            after_created_at=query.after_created_at,
+            after_id=query.after_id,
         )
         return result
     except Exception as e:
@@ -642,6 +648,9 @@ async def get_organization_analyses(
             end_date=request.end_date,
             page=request.page,
             page_size=request.page_size,
+            after_exam_date=request.after_exam_date,
+            after_created_at=request.after_created_at,
+            after_id=request.after_id,
         )
         return result
     except Exception as e:
@@ -661,6 +670,9 @@ async def get_analyses_without_exam_result(
             organization_name=request.organization_name,
             page=request.page,
             page_size=request.page_size,
+            after_exam_date=request.after_exam_date,
+            after_created_at=request.after_created_at,
+            after_id=request.after_id,
         )
         return result
     except Exception as e:
@@ -681,6 +693,9 @@ async def get_analyses_by_exam_type(
             exam_type=request.exam_type,
             page=request.page,
             page_size=request.page_size,
+            after_exam_date=request.after_exam_date,
+            after_created_at=request.after_created_at,
+            after_id=request.after_id,
         )
         return result
     except Exception as e:
@@ -705,6 +720,9 @@ async def get_organization_analyses(
             end_date=end_date,
             page=query.page,
             page_size=query.page_size,
+            after_exam_date=query.after_exam_date,
+            after_created_at=query.after_created_at,
+            after_id=query.after_id,
         )
         return result
     except Exception as e:
@@ -722,6 +740,9 @@ async def get_analyses_without_exam_result(
             organization_name=organization_name,
             page=query.page,
             page_size=query.page_size,
+            after_exam_date=query.after_exam_date,
+            after_created_at=query.after_created_at,
+            after_id=query.after_id,
         )
         return result
     except Exception as e:
@@ -740,6 +761,9 @@ async def get_analyses_by_exam_type(
             exam_type=query.exam_type,
             page=query.page,
             page_size=query.page_size,
+            after_exam_date=query.after_exam_date,
+            after_created_at=query.after_created_at,
+            after_id=query.after_id,
         )
         return result
     except Exception as e:
@@ -762,6 +786,23 @@ async def get_analysis_statistics(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/exam-analyses/statistics/batch", tags=["exam-analyses"])
+async def get_analysis_statistics_batch(
+    organization_names: List[str] = Query(...),
+    query: AnalysisStatisticsQuery = Depends(),
+    token_data: Dict[str, Any] = Depends(get_token_data_from_header)
+):
+    """Return exam analysis statistics for several organizations, keyed by organization name."""
+    try:
+        stats = await analysis_service.get_analysis_statistics_batch(
+            organization_names=organization_names,
+            start_date=query.start_date,
+            end_date=query.end_date,
+        )
+        return stats
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/audit/organization/{organization_name}", response_model=PaginatedAuditResponse, tags=["exam-audits"])
 async def get_audit_by_organization(
     organization_name: str,
@@ -776,6 +817,7 @@ async def get_audit_by_organization(
     - **action_type**: action type (INSERT, UPDATE, DELETE)
     - **page**: page number (default 1)
     - **page_size**: items per page (default 50)
+    - **after_changed_at** / **after_id**: next_cursor of the previous page (keyset pagination, ignores page)
     """
     await auth_service.validate_token(token)
     result = await exam_analysis_audit_service.get_audit_by_organization(
@@ -784,7 +826,9 @@ async def get_audit_by_organization(
         end_date=query.end_date,
         action_type=query.action_type,
         page=query.page,
-        page_size=query.page_size
+        page_size=query.page_size,
+        after_changed_at=query.after_changed_at,
+        after_id=query.after_id
     )
     return result
 
@@ -800,12 +844,15 @@ async def get_audit_by_user(
     - **db_user**: database username (e.g., "app_user")
     - **limit**: maximum number of records (default 100)
     - **offset**: pagination offset
+    - **after_changed_at** / **after_id**: changed_at and id of the last record of the previous page
     """
     await auth_service.validate_token(token)
     audits = await exam_analysis_audit_service.get_audit_by_user(
         db_user=db_user,
         limit=query.limit,
-        offset=query.offset
+        offset=query.offset,
+        after_changed_at=query.after_changed_at,
+        after_id=query.after_id
     )
     return audits
 
@@ -821,13 +868,16 @@ async def get_audit_by_date_range(
     - **end_date**: end date/time
     - **page**: page number
     - **page_size**: items per page
+    - **after_changed_at** / **after_id**: next_cursor of the previous page (keyset pagination, ignores page)
     """
     await auth_service.validate_token(token)
     result = await exam_analysis_audit_service.get_audit_by_date_range(
         start_date=query.start_date,
         end_date=query.end_date,
         page=query.page,
-        page_size=query.page_size
+        page_size=query.page_size,
+        after_changed_at=query.after_changed_at,
+        after_id=query.after_id
     )
     return result
 # =============================================================================
@@ -844,15 +894,33 @@ async def get_audit_for_analysis(
     - **analysis_id**: UUID da análise
     - **limit**: máximo de registros (padrão 100)
     - **offset**: deslocamento para paginação
+    - **after_changed_at** / **after_id**: changed_at e id do último registro da página anterior
     """
     await auth_service.validate_token(token)
     audits = await exam_analysis_audit_service.get_audit_for_analysis(
         analysis_id=analysis_id,
         limit=query.limit,
-        offset=query.offset
+        offset=query.offset,
+        after_changed_at=query.after_changed_at,
+        after_id=query.after_id
     )
     return audits
 
+
+@app.get("/audit/detail/{audit_id}", response_model=ExamAnalysisAuditResponse, tags=["exam-audits"])
+async def get_audit_detail(
+    audit_id: UUID,
+    token_data: Dict[str, Any] = Depends(get_token_data_from_header)
+):
+    """
+    Retorna um registro de auditoria completo, incluindo old_data, new_data e changed_fields.
+    - **audit_id**: UUID do registro de auditoria
+    """
+    audit = await audit_service.get_audit_detail(audit_id)
+    if not audit:
+        raise HTTPException(status_code=404, detail="Audit record not found")
+    return audit
+
 # =============================================================================
 # MONITORING ENDPOINTS (agora GET com token no header)
 # =============================================================================
@@ -114,6 +114,9 @@ class OrganizationExamsRequest(AuthenticatedRequest):
     end_date: Optional[date] = None
     page: int = 1
     page_size: int = 50
+    after_requested_at: Optional[date] = Field(None, description="requested_at do último exame da página anterior")
+    after_created_at: Optional[datetime] = Field(None, description="created_at do último exame da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id do último exame da página anterior")
 
     @field_validator('page')
     @classmethod
@@ -140,6 +143,9 @@ class PatientExamsRequest(AuthenticatedRequest):
     end_date: Optional[date] = None
     page: int = 1
     page_size: int = 50
+    after_requested_at: Optional[date] = Field(None, description="requested_at do último exame da página anterior")
+    after_created_at: Optional[datetime] = Field(None, description="created_at do último exame da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id do último exame da página anterior")
 
     @field_validator('page')
     @classmethod
@@ -259,6 +265,8 @@ class PaginatedExamsResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    # Cursor da próxima página (after_requested_at/after_created_at/after_id); None na última página
+    next_cursor: Optional[Dict[str, Any]] = None
 
 
 # =============================================================================
@@ -319,6 +327,9 @@ class OrganizationAnalysesRequest(AuthenticatedRequest):
     end_date: Optional[date] = None
     page: int = 1
     page_size: int = 50
+    after_exam_date: Optional[datetime] = Field(None, description="exam_date da última análise da página anterior")
+    after_created_at: Optional[datetime] = Field(None, description="created_at da última análise da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id da última análise da página anterior")
 
     @field_validator('page')
     @classmethod
@@ -348,6 +359,9 @@ class AnalysesWithoutResultRequest(AuthenticatedRequest):
     organization_name: str
     page: int = 1
     page_size: int = 50
+    after_exam_date: Optional[datetime] = Field(None, description="exam_date da última análise da página anterior")
+    after_created_at: Optional[datetime] = Field(None, description="created_at da última análise da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id da última análise da página anterior")
 
     @field_validator('page')
     @classmethod
@@ -371,6 +385,9 @@ class AnalysesByTypeRequest(AuthenticatedRequest):
     exam_type: str
     page: int = 1
     page_size: int = 50
+    after_exam_date: Optional[datetime] = Field(None, description="exam_date da última análise da página anterior")
+    after_created_at: Optional[datetime] = Field(None, description="created_at da última análise da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id da última análise da página anterior")
 
     @field_validator('page')
     @classmethod
@@ -429,6 +446,8 @@ class PaginatedAnalysesResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    # Cursor da próxima página (after_exam_date/after_created_at/after_id); None na última página
+    next_cursor: Optional[Dict[str, Any]] = None
 
 
 class AnalysisStatisticsResponse(BaseModel):
@@ -514,6 +533,9 @@ class OrganizationExamsQuery(BaseModel):
     end_date: Optional[date] = None
     page: int = 1
     page_size: int = 50
+    after_requested_at: Optional[date] = Field(None, description="requested_at do último exame da página anterior")
+    after_created_at: Optional[datetime] = Field(None, description="created_at do último exame da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id do último exame da página anterior")
 
     @field_validator('page')
     @classmethod
@@ -541,6 +563,9 @@ class PatientExamsQuery(BaseModel):
     end_date: Optional[date] = None
     page: int = 1
     page_size: int = 50
+    after_requested_at: Optional[date] = Field(None, description="requested_at do último exame da página anterior")
+    after_created_at: Optional[datetime] = Field(None, description="created_at do último exame da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id do último exame da página anterior")
 
     @field_validator('page')
     @classmethod
@@ -627,6 +652,9 @@ class OrganizationAnalysesQuery(BaseModel):
     end_date: Optional[date] = None
     page: int = 1
     page_size: int = 50
+    after_exam_date: Optional[datetime] = Field(None, description="exam_date da última análise da página anterior")
+    after_created_at: Optional[datetime] = Field(None, description="created_at da última análise da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id da última análise da página anterior")
 
     @field_validator('page')
     @classmethod
@@ -656,6 +684,9 @@ class AnalysesWithoutResultQuery(BaseModel):
     """Query parameters para GET /exam-analyses/without-result"""
     page: int = 1
     page_size: int = 50
+    after_exam_date: Optional[datetime] = Field(None, description="exam_date da última análise da página anterior")
+    after_created_at: Optional[datetime] = Field(None, description="created_at da última análise da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id da última análise da página anterior")
 
     @field_validator('page')
     @classmethod
@@ -679,6 +710,9 @@ class AnalysesByTypeQuery(BaseModel):
     exam_type: str
     page: int = 1
     page_size: int = 50
+    after_exam_date: Optional[datetime] = Field(None, description="exam_date da última análise da página anterior")
+    after_created_at: Optional[datetime] = Field(None, description="created_at da última análise da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id da última análise da página anterior")
 
     @field_validator('page')
     @classmethod
@@ -725,6 +759,10 @@ class ExamAnalysisAuditResponse(BaseModel):
     application_name: Optional[str] = None
     db_user: Optional[str] = None
     changed_at: datetime
+    # Listagens não trazem old_data/new_data/changed_fields, apenas se existem;
+    # o registro completo vem de GET /audit/detail/{audit_id}
+    has_old_data: Optional[bool] = None
+    has_new_data: Optional[bool] = None
     # Campos adicionais quando há JOIN com exam_analyses (opcionais)
     exam_type: Optional[str] = None
     organizations_id: Optional[UUID] = None
@@ -740,6 +778,8 @@ class PaginatedAuditResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    # Cursor da próxima página (after_changed_at/after_id); None na última página
+    next_cursor: Optional[Dict[str, Any]] = None
 
 
 # ----- Query Parameters para endpoints GET -----
@@ -748,6 +788,8 @@ class AuditForAnalysisQuery(BaseModel):
     """Query parameters para GET /audit/analysis/{analysis_id}"""
     limit: int = Field(100, ge=1, le=1000, description="Número máximo de registros")
     offset: int = Field(0, ge=0, description="Deslocamento para paginação")
+    after_changed_at: Optional[datetime] = Field(None, description="changed_at do último registro da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id do último registro da página anterior")
 
 
 class AuditByOrganizationQuery(BaseModel):
@@ -757,6 +799,8 @@ class AuditByOrganizationQuery(BaseModel):
     action_type: Optional[str] = Field(None, description="Filtrar por tipo de ação (INSERT, UPDATE, DELETE)")
     page: int = Field(1, ge=1, description="Número da página")
     page_size: int = Field(50, ge=1, le=100, description="Itens por página")
+    after_changed_at: Optional[datetime] = Field(None, description="changed_at do último registro da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id do último registro da página anterior")
 
     @field_validator('end_date')
     @classmethod
@@ -770,6 +814,8 @@ class AuditByUserQuery(BaseModel):
     """Query parameters para GET /audit/user/{db_user}"""
     limit: int = Field(100, ge=1, le=1000, description="Número máximo de registros")
     offset: int = Field(0, ge=0, description="Deslocamento para paginação")
+    after_changed_at: Optional[datetime] = Field(None, description="changed_at do último registro da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id do último registro da página anterior")
 
 
 class AuditByDateRangeQuery(BaseModel):
@@ -778,6 +824,8 @@ class AuditByDateRangeQuery(BaseModel):
     end_date: datetime = Field(..., description="Data/hora final (obrigatório)")
     page: int = Field(1, ge=1, description="Número da página")
     page_size: int = Field(50, ge=1, le=100, description="Itens por página")
+    after_changed_at: Optional[datetime] = Field(None, description="changed_at do último registro da página anterior")
+    after_id: Optional[UUID] = Field(None, description="id do último registro da página anterior")
 
     @field_validator('end_date')
     @classmethod
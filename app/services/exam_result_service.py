@@ -1,8 +1,9 @@
 from fastapi import FastAPI, HTTPException, Depends, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from uuid import UUID
 from datetime import datetime
+from pydantic import BaseModel
 
 from app.database import db
 from app.services.exam_scheduling_service import exam_scheduling_service
@@ -15,6 +16,13 @@ from app.schemas import (
     ExamListRequest
 )
 
+
+class ExamSchedulingPageResponse(BaseModel):
+    exams: List[ExamSchedulingResponse]
+    # Cursor of the next page (after_date/after_id); None on the last page
+    next_cursor: Optional[Dict[str, Any]] = None
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Medical Exam Scheduling API",
@@ -263,12 +271,14 @@ async def delete_exam_scheduling(
         )
 
 @app.get("/exams/",
-         response_model=List[ExamSchedulingResponse],
+         response_model=ExamSchedulingPageResponse,
          summary="List exams by organization",
-         description="List all exam schedules for an organization with pagination")
+         description="List all exam schedules for an organization with keyset or page pagination")
 async def list_exam_schedules(
     organization_name: str = Query(..., description="Organization name to filter exams"),
-    page: int = Query(1, ge=1, description="Page number for pagination"),
+    page: int = Query(1, ge=1, description="Page number, used when no cursor is given"),
+    after_date: Optional[datetime] = Query(None, description="scheduled_date from the previous page's next_cursor"),
+    after_id: Optional[UUID] = Query(None, description="id from the previous page's next_cursor"),
     page_size: int = Query(10, ge=1, le=100, description="Number of items per page"),
     status: Optional[str] = Query(None, description="Filter by exam status")
 ):
@@ -276,18 +286,22 @@ async def list_exam_schedules(
     List exam schedules for an organization.
     
     - **organization_name**: Name of the organization
-    - **page**: Page number (default: 1)
+    - **page**: Page number (default: 1), ignored when a cursor is given
+    - **after_date** / **after_id**: Cursor returned by the previous page (omit for the first page)
     - **page_size**: Items per page (default: 10, max: 100)
     - **status**: Filter by status (scheduled, in-progress, completed, cancelled, postponed)
     """
     try:
-        print(f"DEBUG: Listing exams for organization: '{organization_name}', page: {page}, status: {status}")
+        print(f"DEBUG: Listing exams for organization: '{organization_name}', after: {after_date}, status: {status}")
         
-        exams = exam_scheduling_service.list_exams_by_organization(
-            organization_name, page, page_size, status
+        result = exam_scheduling_service.list_exams_by_organization(
+            organization_name, page_size, status, after_date, after_id, page
         )
         
-        return [ExamSchedulingResponse(**exam) for exam in exams]
+        return ExamSchedulingPageResponse(
+            exams=[ExamSchedulingResponse(**exam) for exam in result["exams"]],
+            next_cursor=result["next_cursor"]
+        )
         
     except Exception as e:
         print(f"ERROR: Unexpected error listing exams: {e}")
@@ -160,26 +160,30 @@ class ExamSchedulingService:
             print(f"Error deleting exam scheduling: {e}")
             return False
     
-    def list_exams_by_organization(self, organization_name: str, page: int = 1, 
-                                 page_size: int = 10, status: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Lists exams for an organization with secure data"""
+    def list_exams_by_organization(self, organization_name: str, page_size: int = 10,
+                                 status: Optional[str] = None, after_date: Optional[datetime] = None,
+                                 after_id: Optional[UUID] = None, page: int = 1) -> Dict[str, Any]:
+        """Lists exams for an organization with secure data, by keyset cursor or by page"""
         try:
-            print(f"DEBUG: Listing exams for org: '{organization_name}', page: {page}, status: {status}")
+            print(f"DEBUG: Listing exams for org: '{organization_name}', after: {after_date}, status: {status}")
             
             org_id = self.get_organization_id_by_name(organization_name)
             if not org_id:
                 print(f"DEBUG: Organization '{organization_name}' not found")
-                return []
+                return {"exams": [], "next_cursor": None}
             
-            results = db.list_exams_by_organization(org_id, page, page_size, status)
+            results, next_cursor = db.list_exams_by_organization(
+                org_id, after_date, after_id, page_size, status, page
+            )
             
-            if results:
-                return [self._sanitize_exam_data(result) for result in results]
-            return []
+            return {
+                "exams": [self._sanitize_exam_data(result) for result in results],
+                "next_cursor": next_cursor
+            }
             
         except Exception as e:
             print(f"Error listing exams: {e}")
-            return []
+            return {"exams": [], "next_cursor": None}
     
     def get_upcoming_exams_secure(self, organization_name: str, hours_ahead: int = 24) -> List[Dict[str, Any]]:
         """Gets upcoming exams with secure data"""